@@ -9,10 +9,13 @@ block_cipher = None
 datas = []
 datas += collect_data_files('streamlit')
 datas += collect_data_files('pandas')
+# The Drive client is built from this bundled discovery document instead of fetching it
+datas += collect_data_files('googleapiclient', includes=['discovery_cache/documents/drive.v3.json'])
 
 # Add your app files
 datas += [
     ('your_main_app.py', '.'),
+    ('scrubber', 'scrubber'),
     ('.env', '.')
 ]
 
@@ -0,0 +1 @@
+"""Benchmarks of the scrub pipeline on synthetic data: ``python -m benchmarks``"""
@@ -0,0 +1,272 @@
+"""Benchmark the scrub pipeline per stage and end to end
+
+    python -m benchmarks --size medium --output report.json
+    python -m benchmarks --size medium --baseline report.json
+
+Each stage is timed ``--repeat`` times and the best run is kept; a
+separate run under tracemalloc records its peak Python/NumPy memory
+(several times slower, ``--skip-memory`` leaves it out).
+With ``--baseline`` every stage is compared with an earlier report and
+the exit status is 1 if any got slower by more than ``--tolerance``.
+When PyQt6 is installed the app's time to first window is measured too.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from scrubber.formats import available_formats
+from scrubber.ingest import read_list, read_log
+from scrubber.normalize import NormalizationCache, normalize_phones, repair_float_text
+from scrubber.output import serialize_outputs, write_zip
+from scrubber.pipeline import find_phone_columns, prepare_list, process_data, run, scrub_log
+
+from .synthetic import generate
+
+SIZES = {
+    "small": {"list_rows": 20000, "log_rows": 20000, "logs": 3},
+    "medium": {"list_rows": 200000, "log_rows": 200000, "logs": 4},
+    "large": {"list_rows": 2000000, "log_rows": 1000000, "logs": 8},
+}
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "your_main_app.py")
+
+# The per-cell baseline is slow, so it and normalize_phones are measured on a sample this big
+CLEAN_NUMBER_SAMPLE = 100000
+
+
+def _clean_number(phone):
+    # The app's original clean_number, kept here as the baseline
+    phone = str(phone)
+    phone = re.sub(r'\D', '', phone)
+    if phone.startswith('1') and len(phone) > 10:
+        phone = phone[1:]
+    return phone
+
+
+def _repair_cell(x):
+    if x.replace(".", "").isdigit():
+        try:
+            return f"{int(float(x))}"
+        except ValueError:
+            # The original crashed on dotted numbers like 555.123.4567; they are kept
+            return x
+    return x
+
+
+def per_cell_clean(values):
+    """The app's original per-cell path: repair float text with int(float(x)), then clean_number"""
+    return values.astype(str).apply(_repair_cell).apply(_clean_number)
+
+
+def measure(stage, rows, repeat, trace_memory=True):
+    """Best wall time of stage() over repeat runs plus its peak traced memory"""
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            stage()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 6),
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+        "peak_mb": round(peak / 2 ** 20, 2) if peak is not None else None,
+    }
+
+
+def measure_startup(repeat, work_dir):
+    """Best time from the app's first import to its window showing, over repeat launches"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    seconds = float("inf")
+    for _ in range(repeat):
+        # Launched from an empty directory, so Drive fails to connect instead of connecting
+        output = subprocess.run([sys.executable, APP, "--measure-startup"], cwd=work_dir, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        seconds = min(seconds, json.loads(output.splitlines()[-1])["window_seconds"])
+    return {"rows": None, "seconds": seconds, "rows_per_sec": None, "peak_mb": None}
+
+
+def max_rss_mb():
+    """Peak resident set size of this process, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 2)
+
+
+def run_stages(dataset, work_dir, repeat, workers, progress, trace_memory=True):
+    """Time every stage on a generated dataset, returning {stage: result}"""
+    log_names = [os.path.basename(path) for path in dataset.log_files]
+    list_df = read_list(dataset.list_file, columns=None)
+    log_dfs = [read_log(path) for path in dataset.log_files]
+    log_rows = sum(len(log_df) for log_df in log_dfs)
+    phone_columns = [log_df[col] for log_df in log_dfs for col in find_phone_columns(log_df.columns)]
+    phone_cells = pd.concat(phone_columns, ignore_index=True)
+    sample = phone_cells.iloc[:CLEAN_NUMBER_SAMPLE]
+    _, suppression = prepare_list(list_df, dataset.conditions)
+    results = process_data(log_dfs, list_df, dataset.conditions, log_names)
+    output_rows = len(results[0]) + sum(len(df) for dfs in results[1:] for df in dfs)
+
+    def normalize_cached():
+        # Column by column through one cache, as a run normalizes them
+        cache = NormalizationCache()
+        for column in phone_columns:
+            cache.normalize(column)
+        return cache
+
+    def write_outputs(output_format="csv"):
+        outputs = serialize_outputs(*results, log_names, "bench", output_format=output_format)
+        try:
+            write_zip(outputs, os.path.join(work_dir, "outputs.zip"))
+        finally:
+            for output in outputs:
+                output.close()
+
+    stages = {
+        "read": (lambda: (read_list(dataset.list_file, columns=None),
+                          [read_log(path) for path in dataset.log_files]), len(list_df) + log_rows),
+        "clean_number": (lambda: per_cell_clean(sample), len(sample)),
+        "normalize_phones": (lambda: normalize_phones(repair_float_text(sample)), len(sample)),
+        "normalize_cached": (normalize_cached, len(phone_cells)),
+        "prepare_list": (lambda: prepare_list(list_df, dataset.conditions), len(list_df)),
+        "scrub_logs": (lambda: [scrub_log(log_df, suppression) for log_df in log_dfs], log_rows),
+        "process_data": (lambda: process_data(log_dfs, list_df, dataset.conditions, log_names), log_rows),
+        "output": (write_outputs, output_rows),
+        **{
+            f"output_{output_format}": (lambda output_format=output_format: write_outputs(output_format), output_rows)
+            for output_format in available_formats() if output_format != "csv"
+        },
+        "end_to_end": (lambda: run(dataset.list_file, dataset.log_files, dataset.conditions,
+                                   os.path.join(work_dir, "run")), len(list_df) + log_rows),
+    }
+    if workers > 1:
+        stages[f"end_to_end_{workers}_workers"] = (
+            lambda: run(dataset.list_file, dataset.log_files, dataset.conditions,
+                        os.path.join(work_dir, "run"), workers=workers),
+            len(list_df) + log_rows,
+        )
+
+    report = {}
+    for name, (stage, rows) in stages.items():
+        progress(f"Benchmarking {name}...")
+        report[name] = measure(stage, rows, repeat, trace_memory)
+        progress(f"  {report[name]['seconds']:.3f}s, {report[name]['rows_per_sec'] or 0:,} rows/s"
+                 + (f", {report[name]['peak_mb']} MB peak" if trace_memory else ""))
+    if importlib.util.find_spec("PyQt6") is not None:
+        progress("Benchmarking startup...")
+        report["startup"] = measure_startup(repeat, work_dir)
+        progress(f"  {report['startup']['seconds']:.3f}s to the first window")
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Stages that got slower than the baseline by more than tolerance, as (stage, ratio)"""
+    regressions = []
+    for name, result in report["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before and before["seconds"]:
+            ratio = result["seconds"] / before["seconds"]
+            if ratio > 1 + tolerance:
+                regressions.append((name, ratio))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=SIZES, default="small", help="preset data size (default: small)")
+    parser.add_argument("--list-rows", type=int, help="list file rows (overrides --size)")
+    parser.add_argument("--log-rows", type=int, help="rows per log file (overrides --size)")
+    parser.add_argument("--logs", type=int, help="number of log files (overrides --size)")
+    parser.add_argument("--phone-columns", type=int, default=2, help="phone columns per log (default: 2)")
+    parser.add_argument("--match-rate", type=float, default=0.1,
+                        help="share of log phone cells that are suppressed (default: 0.1)")
+    parser.add_argument("--dirty-rate", type=float, default=0.3,
+                        help="share of phone cells in a messy format (default: 0.3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, best kept (default: 3)")
+    parser.add_argument("--skip-memory", action="store_true", help="don't trace peak memory per stage")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="also time an end-to-end run on this many processes")
+    parser.add_argument("--data-dir", help="keep the generated CSVs here instead of a temp directory")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against --baseline before failing (default: 0.2)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = dict(SIZES[args.size], phone_columns=args.phone_columns, match_rate=args.match_rate,
+                  dirty_rate=args.dirty_rate, seed=args.seed)
+    for key in ("list_rows", "log_rows", "logs"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    def progress(message):
+        print(message, file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        progress(f"Generating {config['list_rows']} list rows and {config['logs']} logs "
+                 f"of {config['log_rows']} rows...")
+        dataset = generate(args.data_dir or os.path.join(work_dir, "data"), **config)
+        stages = run_stages(dataset, work_dir, args.repeat, args.workers, progress,
+                            not args.skip_memory)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "config": dict(config, repeat=args.repeat, workers=args.workers),
+        "stages": stages,
+        "max_rss_mb": max_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            progress("Warning: the baseline was run with a different configuration")
+        regressions = compare(report, baseline, args.tolerance)
+        for name, ratio in regressions:
+            progress(f"Regression: {name} is {ratio:.2f}x slower than the baseline")
+        if regressions:
+            return 1
+        progress("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
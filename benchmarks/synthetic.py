@@ -0,0 +1,98 @@
+"""Synthetic list and log CSVs of a configurable size and shape
+
+The list holds a pool of suppressed numbers, each logged ``threshold``
+times as SMS, and a pool of numbers logged once. ``match_rate`` of the log
+phone cells are drawn from the suppressed pool; ``dirty_rate`` of all
+phone cells are written in one of the messy formats found in real exports.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+SUPPRESSED_TYPE = "SMS"
+OTHER_TYPES = ["Call", "Voicemail", "sms "]
+
+DIRTY_FORMATS = ("international", "float", "scientific", "dotted", "leading_one")
+
+Dataset = namedtuple("Dataset", "list_file log_files conditions")
+
+
+def random_numbers(rng, count):
+    """Ten-digit 555 numbers as int64"""
+    return 5550000000 + rng.integers(0, 10000000, size=count, dtype=np.int64)
+
+
+def format_numbers(rng, numbers, dirty_rate):
+    """Phone cells as text, dirty_rate of them in a random messy format"""
+    text = pd.Series(numbers.astype(str), dtype=object)
+    dirty = rng.random(len(text)) < dirty_rate
+    formats = rng.integers(0, len(DIRTY_FORMATS), size=len(text))
+    for code, name in enumerate(DIRTY_FORMATS):
+        rows = dirty & (formats == code)
+        if not rows.any():
+            continue
+        digits = text[rows]
+        if name == "international":
+            text[rows] = "+1 (" + digits.str[:3] + ") " + digits.str[3:6] + "-" + digits.str[6:]
+        elif name == "float":
+            text[rows] = digits + ".0"
+        elif name == "scientific":
+            # As Excel writes large numbers, e.g. 5.551234567e9
+            text[rows] = digits.str[:1] + "." + digits.str[1:] + "e9"
+        elif name == "dotted":
+            text[rows] = digits.str[:3] + "." + digits.str[3:6] + "." + digits.str[6:]
+        else:
+            text[rows] = "1" + digits
+    return text
+
+
+def make_list(rng, list_rows, suppressed, threshold, dirty_rate):
+    """List rows: every suppressed number threshold times as SMS, the rest once as other types"""
+    repeated = np.repeat(suppressed, threshold)[:list_rows]
+    others = random_numbers(rng, list_rows - len(repeated))
+    log_types = np.concatenate([
+        np.full(len(repeated), SUPPRESSED_TYPE, dtype=object),
+        rng.choice(np.array(OTHER_TYPES, dtype=object), size=len(others)),
+    ])
+    order = rng.permutation(list_rows)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, size=list_rows), unit="D")
+    return pd.DataFrame({
+        "Log Type": log_types[order],
+        "Phone": format_numbers(rng, np.concatenate([repeated, others])[order], dirty_rate).to_numpy(),
+        "Date": dates.strftime("%Y-%m-%d"),
+    })
+
+
+def make_log(rng, log_rows, phone_columns, suppressed, match_rate, dirty_rate):
+    """Log rows with a few non-phone columns and phone_columns phone columns"""
+    log = {
+        "Name": pd.Series(np.arange(log_rows)).map("caller {}".format),
+        "Duration": rng.integers(0, 3600, size=log_rows),
+        "Notes": rng.choice(np.array(["", "left message", "no answer"], dtype=object), size=log_rows),
+    }
+    for c in range(phone_columns):
+        numbers = random_numbers(rng, log_rows)
+        matched = rng.random(log_rows) < match_rate
+        numbers[matched] = rng.choice(suppressed, size=int(matched.sum()))
+        log["Phone" if c == 0 else f"Mobile {c}"] = format_numbers(rng, numbers, dirty_rate)
+    return pd.DataFrame(log)
+
+
+def generate(out_dir, list_rows=20000, log_rows=20000, logs=3, phone_columns=2, match_rate=0.1,
+             dirty_rate=0.3, threshold=2, seed=0):
+    """Write list.csv and log_<n>.csv files to out_dir and return their Dataset"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    suppressed = random_numbers(rng, max(list_rows // (2 * threshold), 1))
+
+    list_file = os.path.join(out_dir, "list.csv")
+    make_list(rng, list_rows, suppressed, threshold, dirty_rate).to_csv(list_file, index=False)
+
+    log_files = []
+    for n in range(logs):
+        log_file = os.path.join(out_dir, f"log_{n}.csv")
+        make_log(rng, log_rows, phone_columns, suppressed, match_rate, dirty_rate).to_csv(log_file, index=False)
+        log_files.append(log_file)
+    return Dataset(list_file, log_files, [{"type": SUPPRESSED_TYPE, "threshold": threshold}])
@@ -0,0 +1,28 @@
+"""GUI-free building blocks of the log scrubbing pipeline
+
+Submodules are imported on first attribute access so that ``python -m
+scrubber`` can parse its arguments before pandas is loaded.
+"""
+import importlib
+
+_EXPORTS = {
+    "read_list": "ingest",
+    "read_log": "ingest",
+    "clean_number": "normalize",
+    "normalize_phones": "normalize",
+    "repair_float_text": "normalize",
+    "NormalizationCache": "normalize",
+    "PhoneColumnClassifier": "columns",
+    "SuppressionIndex": "suppression",
+    "AuditLog": "audit",
+    "process_data": "pipeline",
+    "run": "pipeline",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
@@ -0,0 +1,204 @@
+"""Audit index: which numbers each run removed, from which log, column and condition
+
+    python -m scrubber.audit 5551234567 "(555) 765-4321"
+
+Every run appends its removed records to a SQLite file, one row per
+(run, log, column, number, condition) with how many log rows it covered.
+Numbers are stored normalized and indexed, so looking one up stays fast
+over years of runs.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from .conditions import parse_rules
+from .formats import read_frame
+from .normalize import normalize_phone_column, normalize_phones, repair_float_text
+from .result_cache import default_cache_dir
+
+# Numbers per lookup query, below SQLite's limit on bound parameters
+_LOOKUP_BATCH = 500
+
+# Rows of a removed-records output read at a time when recording it
+RECORD_CHUNK_ROWS = 100000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    list_file TEXT NOT NULL,
+    conditions TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS removed (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    phone TEXT NOT NULL,
+    log_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS removed_by_phone ON removed (phone);
+"""
+
+_LOOKUP = """
+SELECT removed.phone, runs.started, removed.log_name, removed.column_name, removed.condition, removed.rows,
+       runs.list_file
+FROM removed JOIN runs ON runs.id = removed.run_id
+WHERE removed.phone IN ({placeholders})
+ORDER BY removed.phone, runs.started, removed.log_name
+"""
+
+LOOKUP_FIELDS = ("phone", "started", "log", "column", "condition", "rows", "list_file")
+
+
+def default_audit_path():
+    """Per-user audit index of the app, next to its result cache"""
+    return os.path.join(os.path.dirname(default_cache_dir()), 'audit.sqlite')
+
+
+def matched_numbers(removed_df, phone_columns, suppression):
+    """(column, number, condition) of each removed record, found as the scrub found it
+
+    A record was removed under the first phone column whose number is
+    suppressed; conditions come from ``suppression.matches``.
+    """
+    parts = [pd.DataFrame(columns=["column", "phone", "condition"])]
+    found = np.zeros(len(removed_df), dtype=bool)
+    for col in phone_columns:
+        if col not in removed_df:
+            continue
+        phones = normalize_phone_column(removed_df[col])
+        hits = suppression.contains_normalized(phones.keys, phones.digits) & ~found
+        found |= hits
+        if hits.any():
+            digits = phones.digits.to_numpy()[hits]
+            parts.append(pd.DataFrame({
+                "column": col,
+                "phone": digits,
+                "condition": suppression.conditions_of(phones.keys[hits], digits),
+            }))
+    return pd.concat(parts, ignore_index=True)
+
+
+class AuditLog:
+    """SQLite audit index of removed numbers across runs"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def start_run(self, list_file, conditions):
+        """Register a run, returning its id"""
+        labels = [rule.label for rule in parse_rules(conditions)]
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO runs (started, list_file, conditions) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), os.path.basename(list_file), json.dumps(labels))
+            )
+        return cursor.lastrowid
+
+    def record(self, run_id, log_name, removed, phone_columns, suppression):
+        """Add a log's removed records to a run, returning how many numbers were recorded
+
+        ``removed`` is a frame of the records or an iterable of frames, such
+        as the chunks of a large output.
+        """
+        frames = [removed] if isinstance(removed, pd.DataFrame) else removed
+        counts = []
+        for removed_df in frames:
+            matched = matched_numbers(removed_df, phone_columns, suppression)
+            if not matched.empty:
+                counts.append(matched.groupby(["column", "phone", "condition"], sort=False).size())
+        if not counts:
+            return 0
+        counts = pd.concat(counts).groupby(level=[0, 1, 2], sort=False).sum()
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO removed (run_id, phone, log_name, column_name, condition, rows) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((run_id, phone, log_name, col, condition, int(rows))
+                 for (col, phone, condition), rows in counts.items())
+            )
+        return len(counts)
+
+    def record_output(self, run_id, log_name, path, output_format, column_classifier, suppression,
+                      chunksize=RECORD_CHUNK_ROWS):
+        """Add a removed-records output file to a run, reading it chunksize rows at a time"""
+        chunks = read_frame(path, output_format, chunksize)
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        return self.record(run_id, log_name, chain([first], chunks), column_classifier.select(first, log_name),
+                           suppression)
+
+    def lookup(self, numbers):
+        """Audit entries of numbers, written in any format, as dicts of LOOKUP_FIELDS"""
+        phones = normalize_phones(repair_float_text(pd.Series(list(numbers), dtype=object))).unique().tolist()
+        entries = []
+        for start in range(0, len(phones), _LOOKUP_BATCH):
+            batch = phones[start:start + _LOOKUP_BATCH]
+            rows = self._db.execute(_LOOKUP.format(placeholders=", ".join("?" * len(batch))), batch)
+            entries.extend(dict(zip(LOOKUP_FIELDS, row)) for row in rows)
+        return entries
+
+
+def describe_entry(entry):
+    """One line per audit entry for the lookup command"""
+    condition = entry["condition"] or "unknown condition"
+    rows = f"{entry['rows']} rows" if entry["rows"] != 1 else "1 row"
+    return (f"{entry['phone']}  {entry['started']}  {entry['log']} [{entry['column']}]  "
+            f"{condition}  ({rows}, list {entry['list_file']})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m scrubber.audit",
+        description="Look up when, from which log and under which condition numbers were scrubbed.",
+    )
+    parser.add_argument("numbers", nargs="+", help="phone numbers, in any format")
+    parser.add_argument("--db", default=None, metavar="PATH",
+                        help="audit index to read (default: the app's, also written by python -m scrubber)")
+    parser.add_argument("--json", action="store_true", help="print the entries as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    path = args.db or default_audit_path()
+    if not os.path.exists(path):
+        print(f"No audit index at {path}", file=sys.stderr)
+        return 1
+    with AuditLog(path) as audit:
+        entries = audit.lookup(args.numbers)
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    else:
+        for entry in entries:
+            print(describe_entry(entry))
+        if not entries:
+            print("No removals found", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Command line entry point: ``python -m scrubber``
+
+Only argparse and the standard library are imported up front; pandas and
+the pipeline are loaded once the arguments are valid.
+"""
+import argparse
+import glob
+import sys
+from datetime import date
+
+
+def _parse_count(text, name):
+    try:
+        count = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{name} must be an integer, got {text!r}")
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"{name} must be at least 1")
+    return count
+
+
+def parse_condition(text):
+    """Parse a ``TYPE=MIN_COUNT[..MAX_COUNT][@SINCE..UNTIL]`` condition argument
+
+    TYPE may join several log types with ``+`` (all of them must match) or
+    ``|`` (any of them). The date window counts only list rows whose Date
+    falls in it; either end may be left out.
+    """
+    cond_type, sep, counts = text.rpartition('=')
+    if not sep or not cond_type.strip():
+        raise argparse.ArgumentTypeError(f"expected TYPE=MIN_COUNT, got {text!r}")
+    counts, _, window = counts.partition('@')
+    threshold, dots, maximum = counts.partition('..')
+    condition = {"type": cond_type.strip(), "threshold": _parse_count(threshold, "MIN_COUNT")}
+    if dots:
+        condition["max"] = _parse_count(maximum, "MAX_COUNT")
+        if condition["max"] < condition["threshold"]:
+            raise argparse.ArgumentTypeError("MAX_COUNT must not be below MIN_COUNT")
+
+    for separator, match in (('+', "all"), ('|', "any")):
+        if separator in cond_type:
+            types = [part.strip() for part in cond_type.split(separator)]
+            if not all(types):
+                raise argparse.ArgumentTypeError(f"empty log type in {cond_type!r}")
+            condition["types"] = types
+            condition["match"] = match
+            del condition["type"]
+            break
+
+    if window:
+        since, dots, until = window.partition('..')
+        if not dots:
+            raise argparse.ArgumentTypeError(f"expected a SINCE..UNTIL date window, got {window!r}")
+        for key, value in (("since", since), ("until", until)):
+            if value:
+                try:
+                    date.fromisoformat(value)
+                except ValueError:
+                    raise argparse.ArgumentTypeError(f"expected a YYYY-MM-DD date, got {value!r}")
+                condition[key] = value
+    return condition
+
+
+def expand_log_paths(patterns):
+    """Expand glob patterns (shells on Windows don't) keeping the given order"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(path for path in matches if path not in paths)
+    return paths
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m scrubber",
+        description="Scrub phone numbers found in a list file out of log files.",
+    )
+    parser.add_argument("logs", nargs="+", help="log CSV files or glob patterns")
+    parser.add_argument("-l", "--list", required=True, dest="list_file", help="list CSV file")
+    parser.add_argument(
+        "-c", "--condition", required=True, action="append", type=parse_condition,
+        dest="conditions", metavar="TYPE=MIN_COUNT",
+        help="remove numbers logged at least MIN_COUNT times with this log type (repeatable); "
+             "also TYPE=MIN..MAX, A+B=MIN (all types), A|B=MIN (any type) and TYPE=MIN@SINCE..UNTIL",
+    )
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for the output CSVs")
+    parser.add_argument("--index-cache", help="directory to save and reuse the suppression index in")
+    parser.add_argument(
+        "--occurrence-store", metavar="PATH",
+        help="SQLite file of list occurrence counts; later runs only read rows appended to the list",
+    )
+    parser.add_argument(
+        "--skip-updated-list", action="store_true",
+        help="don't write Updated_List_*.csv (with --index-cache the list is then only read when it changed)",
+    )
+    parser.add_argument(
+        "--chunksize", type=int, metavar="ROWS",
+        help="stream each log file ROWS rows at a time to bound memory use",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=1,
+        help="scrub log files on this many processes (default: 1)",
+    )
+    parser.add_argument(
+        "--split-rows", type=int, metavar="ROWS",
+        help="with --workers, split logs longer than ROWS rows across processes",
+    )
+    parser.add_argument(
+        "--engine", choices=("auto", "c", "pyarrow"), default="auto",
+        help="CSV parser for whole-file reads; auto uses pyarrow when installed (default: auto)",
+    )
+    parser.add_argument(
+        "--format", choices=("csv", "csv.zst", "parquet"), default="csv", dest="output_format",
+        help="output format: plain CSV, zstd-compressed CSV (needs zstandard) or Parquet (needs pyarrow) "
+             "(default: csv)",
+    )
+    parser.add_argument(
+        "--column-sample", type=int, default=200, metavar="ROWS",
+        help="keep a phone-like column only if most of its first ROWS non-empty values are phone numbers; "
+             "0 picks columns by header alone (default: 200)",
+    )
+    parser.add_argument(
+        "--normalization-cache", type=int, default=250000, metavar="ENTRIES",
+        help="phone numbers kept normalized across the list and logs; 0 normalizes every column afresh "
+             "(default: 250000)",
+    )
+    parser.add_argument(
+        "--result-cache", metavar="DIR",
+        help="directory of cached scrubbed outputs, reused for unchanged logs (default: the app's cache)",
+    )
+    parser.add_argument(
+        "--result-cache-size", type=int, default=1024, metavar="MB",
+        help="evict least recently used cached outputs beyond this size (default: 1024)",
+    )
+    parser.add_argument("--no-result-cache", action="store_true", help="bypass the result cache")
+    parser.add_argument(
+        "--audit", metavar="PATH",
+        help="SQLite audit index to add the removed numbers to, see python -m scrubber.audit "
+             "(default: the app's audit index)",
+    )
+    parser.add_argument("--no-audit", action="store_true", help="don't record removed numbers")
+    parser.add_argument("--report", metavar="PATH", help="write per-stage timings and memory use as JSON")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    return parser
+
+
+def print_progress(message, percent=None):
+    prefix = f"[{int(percent):3d}%] " if percent is not None else "       "
+    print(prefix + message, file=sys.stderr)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    log_files = expand_log_paths(args.logs)
+    if not log_files:
+        parser.error("no log files matched")
+
+    from .audit import default_audit_path
+    from .columns import PhoneColumnClassifier
+    from .instrument import RunReport
+    from .normalize import NormalizationCache
+    from .pipeline import no_progress, run
+    from .result_cache import ResultCache, default_cache_dir
+
+    progress = no_progress if args.quiet else print_progress
+    report = RunReport(progress)
+    try:
+        result_cache = None
+        if not args.no_result_cache:
+            result_cache = ResultCache(args.result_cache or default_cache_dir(), args.result_cache_size * 1024 * 1024)
+        written = run(
+            args.list_file,
+            log_files,
+            args.conditions,
+            args.output_dir,
+            progress=progress,
+            index_cache=args.index_cache,
+            write_list=not args.skip_updated_list,
+            chunksize=args.chunksize,
+            workers=args.workers,
+            split_rows=args.split_rows,
+            engine=args.engine,
+            occurrence_store=args.occurrence_store,
+            report=report,
+            result_cache=result_cache,
+            output_format=args.output_format,
+            column_classifier=PhoneColumnClassifier(args.column_sample),
+            audit=None if args.no_audit else args.audit or default_audit_path(),
+            normalization_cache=NormalizationCache(args.normalization_cache),
+        )
+        if args.report:
+            report.save(args.report)
+    except Exception as e:
+        print(f"Processing failed: {str(e)}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        for path in written:
+            print(path)
+    return 0
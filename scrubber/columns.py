@@ -0,0 +1,153 @@
+"""Phone column selection: header rules confirmed by a sample of cell values
+
+A column is a candidate when its header contains one of
+``PHONE_HEADER_PHRASES``. Headers such as "graph_id" or "hotel_name" match
+too, so a PhoneColumnClassifier samples each candidate's non-empty values
+and keeps it only if enough of them normalize to ten-digit numbers.
+A decision that keeps every candidate is shared by all logs with the same
+header schema, so logs that share a layout are sampled once. One that
+skips a column holds for its own log only: a later log with the same
+headers may have numbers in that column, so it is sampled again.
+"""
+import re
+from collections import namedtuple
+
+from .normalize import normalize_phones, repair_float_text
+
+PHONE_HEADER_PHRASES = ('mobile', 'phone', 'number', 'tel', 'contact', 'ph')
+
+_PHONE_HEADER = re.compile('|'.join(re.escape(phrase) for phrase in PHONE_HEADER_PHRASES))
+
+# Selected and skipped columns of a schema, with the sampled share of phone numbers per candidate
+ColumnDecision = namedtuple("ColumnDecision", "selected skipped shares")
+
+
+def find_phone_columns(columns):
+    """Columns whose header looks like it holds phone numbers"""
+    return [col for col in columns if _PHONE_HEADER.search(col.lower())]
+
+
+def phone_share(values, sample_rows):
+    """Share of the first sample_rows non-empty values that normalize to ten digits, or None if all are empty"""
+    text = values.astype(str)
+    sample = text[text.str.strip() != ''].head(sample_rows)
+    if not len(sample):
+        return None
+    digits = normalize_phones(repair_float_text(sample))
+    return float((digits.str.len() == 10).mean())
+
+
+def describe_decision(decision, log_name=''):
+    """Status line of the phone columns picked for a log"""
+    text = f"Phone columns in {log_name}: " if log_name else "Phone columns: "
+    text += ", ".join(decision.selected) or "none"
+    if decision.skipped:
+        skipped = ", ".join(f"{col} ({decision.shares[col]:.0%} phone numbers)" for col in decision.skipped)
+        text += f"; skipped {skipped}"
+    return text
+
+
+class PhoneColumnClassifier:
+    """Pick the phone columns of log frames by header and sampled content
+
+    Of the first ``sample_window`` rows, up to ``sample_rows`` non-empty
+    values per candidate are normalized; a candidate with fewer than
+    ``min_share`` ten-digit numbers among them is skipped. Candidates with
+    no values to sample are kept. ``sample_rows=0`` keeps every candidate,
+    like the header rules alone.
+    """
+
+    def __init__(self, sample_rows=200, min_share=0.5):
+        self.sample_rows = sample_rows
+        self.min_share = min_share
+        # Decisions that keep every candidate, by schema, and those that skip one, by (log name, schema)
+        self.decisions = {}
+        self.log_decisions = {}
+
+    @property
+    def sample_window(self):
+        """Rows to read from the start of a log to decide its columns"""
+        return max(self.sample_rows * 5, 1)
+
+    def rules(self):
+        """Settings that change which columns are picked, for cache keys"""
+        return {"sample_rows": self.sample_rows, "min_share": self.min_share}
+
+    def decide(self, df):
+        """ColumnDecision for a frame with normalized headers"""
+        candidates = find_phone_columns(df.columns)
+        if not self.sample_rows:
+            return ColumnDecision(candidates, [], {})
+        window = df.head(self.sample_window)
+        selected, skipped, shares = [], [], {}
+        for col in candidates:
+            shares[col] = phone_share(window[col], self.sample_rows)
+            if shares[col] is None or shares[col] >= self.min_share:
+                selected.append(col)
+            else:
+                skipped.append(col)
+        return ColumnDecision(selected, skipped, shares)
+
+    def classify(self, df, log_name='', progress=None):
+        """Decide the phone columns of a newly seen log, unless its schema already keeps every candidate"""
+        schema = tuple(df.columns)
+        self.log_decisions.pop((log_name, schema), None)
+        decision = self.decisions.get(schema)
+        if decision is None:
+            decision = self.decide(df)
+            if decision.skipped:
+                self.log_decisions[log_name, schema] = decision
+            else:
+                self.decisions[schema] = decision
+            if progress is not None:
+                progress(describe_decision(decision, log_name))
+        return decision.selected
+
+    def select(self, df, log_name='', progress=None):
+        """Phone columns of a frame of a log, classifying the log the first time it is seen"""
+        schema = tuple(df.columns)
+        decision = self.log_decisions.get((log_name, schema)) or self.decisions.get(schema)
+        if decision is None:
+            return self.classify(df, log_name, progress)
+        return decision.selected
+
+    def as_dict(self):
+        """Settings and decisions as JSON-ready data, for ``from_dict`` in another process or on another machine"""
+        return {
+            **self.rules(),
+            "decisions": [
+                {"columns": list(schema), **decision._asdict()} for schema, decision in self.decisions.items()
+            ],
+            "log_decisions": [
+                {"log": log_name, "columns": list(schema), **decision._asdict()}
+                for (log_name, schema), decision in self.log_decisions.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Classifier with the settings and decisions of ``as_dict``"""
+        classifier = cls(data["sample_rows"], data["min_share"])
+        for entry in data["decisions"]:
+            classifier.decisions[tuple(entry["columns"])] = ColumnDecision(
+                entry["selected"], entry["skipped"], entry["shares"]
+            )
+        for entry in data.get("log_decisions", []):
+            classifier.log_decisions[entry["log"], tuple(entry["columns"])] = ColumnDecision(
+                entry["selected"], entry["skipped"], entry["shares"]
+            )
+        return classifier
+
+    def summary(self):
+        """Decisions per schema, and per log where a column was skipped, for a run report"""
+        return {
+            "schemas": [
+                {"columns": list(schema), "selected": decision.selected, "skipped": {}}
+                for schema, decision in self.decisions.items()
+            ],
+            "logs": [
+                {"log": log_name, "columns": list(schema), "selected": decision.selected,
+                 "skipped": {col: decision.shares[col] for col in decision.skipped}}
+                for (log_name, schema), decision in self.log_decisions.items()
+            ],
+        }
@@ -0,0 +1,154 @@
+"""Condition engine: select the list numbers to suppress in one grouped pass
+
+A condition is a dict. ``{"type": "SMS", "threshold": 2}`` selects numbers
+logged at least twice as SMS, counted per log type as written and matched
+title-cased. Optional keys extend it:
+
+- ``"max"``: upper bound on the count, inclusive
+- ``"types"`` with ``"match"``: several log types of which "any" (the
+  default) or "all" must have a count within the bounds
+- ``"since"`` / ``"until"``: only count list rows whose Date falls in
+  this window, inclusive
+
+Conditions that end up with the same label replace each other, the last
+one winning, as a dict of type to threshold did before.
+
+Numbers are grouped by whatever the ``Phone`` column holds; the pipeline
+passes int64 keys from ``normalize.group_keys`` rather than text.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .ingest import LIST_COLUMNS
+
+DATE_COLUMN = "Date"
+MATCH_MODES = ("any", "all")
+
+Rule = namedtuple("Rule", "label types minimum maximum match window")
+
+
+def _label(types, maximum, match, since, until):
+    label = (" & " if match == "all" else " | ").join(types)
+    if maximum is not None:
+        label += f" (max {maximum})"
+    if since or until:
+        label += f" ({since or '...'} to {until or '...'})"
+    return label
+
+
+def parse_rule(condition):
+    """Turn a condition dict into a Rule"""
+    # Spellings of one type count as that type once, so "all" doesn't wait for a duplicate
+    types = tuple(dict.fromkeys(cond_type.title() for cond_type in condition.get("types") or [condition["type"]]))
+    minimum = condition.get("threshold", 1)
+    maximum = condition.get("max")
+    match = condition.get("match", "any")
+    if match not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode {match!r}, expected 'any' or 'all'")
+    if maximum is not None and maximum < minimum:
+        raise ValueError(f"Condition max {maximum} is below its threshold {minimum}")
+    since, until = condition.get("since"), condition.get("until")
+    window = None
+    if since or until:
+        window = (pd.Timestamp(since) if since else None, pd.Timestamp(until) if until else None)
+    return Rule(_label(types, maximum, match, since, until), types, minimum, maximum, match, window)
+
+
+def parse_rules(conditions):
+    """Rules for a list of condition dicts, one per label in first-seen order"""
+    rules = {}
+    for condition in conditions:
+        rule = parse_rule(condition)
+        rules[rule.label] = rule
+    return list(rules.values())
+
+
+def list_columns(conditions):
+    """List file columns the conditions need"""
+    if any(parse_rule(condition).window for condition in conditions):
+        return LIST_COLUMNS + [DATE_COLUMN]
+    return LIST_COLUMNS
+
+
+def occurrence_table(list_df):
+    """Occurrences of each (Log Type, Phone) pair of a cleaned, normalized list"""
+    return list_df.groupby(["Log Type", "Phone"]).size().reset_index(name="occurrence")
+
+
+def count_occurrences(list_df):
+    """Occurrence table of a list and the occurrence count of each of its rows, from one grouping"""
+    groups = list_df.groupby(["Log Type", "Phone"])
+    sizes = groups.size()
+    return sizes.reset_index(name="occurrence"), sizes.to_numpy()[groups.ngroup().to_numpy()]
+
+
+def _window_rows(list_df, dates, window):
+    since, until = window
+    in_window = dates.notna()
+    if since is not None:
+        in_window &= dates >= since
+    if until is not None:
+        in_window &= dates <= until
+    return list_df.loc[in_window.to_numpy(), ["Log Type", "Phone"]]
+
+
+def _evaluate(occurrences, rules):
+    """Numbers matching each rule, from one merge of the rules onto the occurrence table"""
+    log_types = occurrences["Log Type"].astype("category")
+    # Title-case each distinct log type once instead of every row
+    titles = log_types.cat.categories.str.title()
+
+    rule_rows = []
+    for i, rule in enumerate(rules):
+        for code in np.flatnonzero(titles.isin(rule.types)):
+            rule_rows.append((i, code, rule.types.index(titles[code]), rule.minimum,
+                              np.inf if rule.maximum is None else rule.maximum))
+    numbers = [np.array([], dtype=occurrences["Phone"].dtype) for _ in rules]
+    if not rule_rows:
+        return numbers
+
+    rule_df = pd.DataFrame(rule_rows, columns=["rule", "code", "type", "minimum", "maximum"])
+    hits = pd.DataFrame({
+        "code": log_types.cat.codes.to_numpy(),
+        "Phone": occurrences["Phone"].to_numpy(),
+        "occurrence": occurrences["occurrence"].to_numpy(),
+    }).merge(rule_df, on="code")
+    hits = hits[(hits["occurrence"] >= hits["minimum"]) & (hits["occurrence"] <= hits["maximum"])]
+
+    # A type counts once per number however many spellings of it matched
+    matched_types = hits.groupby(["rule", "Phone"], sort=False)["type"].nunique()
+    required = np.array([len(rule.types) if rule.match == "all" else 1 for rule in rules])
+    required = required[matched_types.index.get_level_values("rule")]
+    matched = matched_types[matched_types.to_numpy() >= required].reset_index()
+    for i, phones in matched.groupby("rule")["Phone"]:
+        numbers[i] = phones.to_numpy()
+    return numbers
+
+
+def select_numbers(occurrences, conditions, list_df=None):
+    """List (label, numbers) for every condition with matches, in condition order
+
+    ``occurrences`` is the occurrence table of the list; conditions with a
+    date window are counted from the rows of ``list_df`` inside it, one
+    grouping per distinct window.
+    """
+    rules = parse_rules(conditions)
+    windows = {rule.window for rule in rules if rule.window is not None}
+    if windows and (list_df is None or DATE_COLUMN not in list_df):
+        raise ValueError(f"Conditions with a date window need a list file with a {DATE_COLUMN} column")
+
+    tables = {None: occurrences}
+    if windows:
+        dates = pd.to_datetime(list_df[DATE_COLUMN], errors="coerce")
+        for window in windows:
+            tables[window] = occurrence_table(_window_rows(list_df, dates, window))
+
+    numbers = [None] * len(rules)
+    for window, table in tables.items():
+        positions = [i for i, rule in enumerate(rules) if rule.window == window]
+        if positions:
+            for i, found in zip(positions, _evaluate(table, [rules[i] for i in positions])):
+                numbers[i] = found
+    return [(rule.label, found) for rule, found in zip(rules, numbers) if len(found)]
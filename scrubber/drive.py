@@ -0,0 +1,150 @@
+"""Concurrent Google Drive uploads over one shared, authorized Drive client"""
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, build_http
+from httplib2 import HttpLib2Error
+
+from .formats import mimetype
+
+UploadJob = namedtuple("UploadJob", "name source folder_id")
+UploadResult = namedtuple("UploadResult", "name file_id error")
+
+
+def build_drive_service(credentials=None, api_endpoint=None):
+    """Build the Drive v3 client, optionally pointed at another endpoint such as a local fake
+
+    The client is built from the discovery document bundled with
+    google-api-python-client, without a network round trip. Frozen builds
+    must ship that one file (see the build workflow); if it is missing the
+    document is fetched instead. ``api_endpoint`` replaces its root URL,
+    which (unlike ``client_options``) also moves the media upload URL.
+    """
+    from googleapiclient.discovery import build, build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = get_static_doc('drive', 'v3')
+    if document is None and not api_endpoint:
+        return build('drive', 'v3', credentials=credentials, static_discovery=False, cache_discovery=False)
+    if document is None:
+        raise RuntimeError("The Drive v3 discovery document is not bundled with google-api-python-client")
+    document = json.loads(document)
+    if api_endpoint:
+        document['rootUrl'] = api_endpoint
+    if credentials is None:
+        return build_from_document(document, http=build_http())
+    return build_from_document(document, credentials=credentials)
+
+
+class DriveUploader:
+    """Upload files to Drive on a bounded thread pool
+
+    Every thread shares one Drive service but gets its own authorized HTTP
+    transport, since httplib2 connections are not thread-safe. Sources
+    larger than ``resumable_threshold`` bytes are sent as resumable uploads
+    in ``chunk_size`` pieces. Each request is retried up to ``retries``
+    times with exponential backoff on 429, 5xx and connection errors; a
+    resumable upload whose chunk is cut off asks the server how much
+    arrived and carries on from there.
+    """
+
+    def __init__(self, service, credentials=None, workers=4, chunk_size=8 * 1024 * 1024,
+                 resumable_threshold=5 * 1024 * 1024, retries=5):
+        self.service = service
+        self.credentials = credentials
+        self.chunk_size = chunk_size
+        self.resumable_threshold = resumable_threshold
+        self.retries = retries
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drive-upload')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def _http(self):
+        """HTTP transport of the calling thread"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            # build_http keeps 308 from being followed as a redirect, which
+            # resumable uploads rely on
+            http = build_http()
+            if self.credentials is not None:
+                from google_auth_httplib2 import AuthorizedHttp
+                http = AuthorizedHttp(self.credentials, http=http)
+            self._local.http = http
+        return http
+
+    def _media(self, name, source):
+        """Media upload for bytes, a seekable binary stream or a file path, typed by the file name"""
+        if isinstance(source, (str, os.PathLike)):
+            resumable = os.path.getsize(source) > self.resumable_threshold
+            return MediaFileUpload(source, mimetype=mimetype(name), chunksize=self.chunk_size, resumable=resumable)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = BytesIO(source)
+        size = source.seek(0, os.SEEK_END)
+        source.seek(0)
+        return MediaIoBaseUpload(source, mimetype=mimetype(name), chunksize=self.chunk_size,
+                                 resumable=size > self.resumable_threshold)
+
+    def upload(self, name, source, folder_id):
+        """Upload one file into folder_id and return its Drive file id"""
+        media = self._media(name, source)
+        request = self.service.files().create(
+            body={'name': name, 'parents': [folder_id]},
+            media_body=media,
+            fields='id',
+        )
+        http = self._http()
+        if not media.resumable():
+            return request.execute(http=http, num_retries=self.retries)['id']
+
+        response = None
+        interruptions = 0
+        while response is None:
+            try:
+                _, response = request.next_chunk(http=http, num_retries=self.retries)
+            except (OSError, HttpLib2Error):
+                # next_chunk doesn't retry a dropped connection itself, but its
+                # next call queries the upload's progress before resending
+                if interruptions >= self.retries:
+                    raise
+                interruptions += 1
+                time.sleep(random.random() * 2 ** interruptions)
+        return response['id']
+
+    def submit(self, name, source, folder_id):
+        """Queue an upload on the pool, returning a Future of the file id"""
+        return self._pool.submit(self.upload, name, source, folder_id)
+
+    def submit_all(self, jobs):
+        """Queue UploadJobs on the pool, returning (job, Future) pairs in job order"""
+        return [(job, self.submit(*job)) for job in (UploadJob(*job) for job in jobs)]
+
+
+def result_of(job, future):
+    """UploadResult of a finished upload Future"""
+    try:
+        return UploadResult(job.name, future.result(), None)
+    except Exception as e:
+        return UploadResult(job.name, None, e)
+
+
+def describe_result(result, done=None, total=None):
+    """Status line for an UploadResult"""
+    if result.error is not None:
+        return f"Failed to upload {result.name}: {str(result.error)}"
+    if done is None:
+        return f"Uploaded {result.name}"
+    return f"Uploaded {result.name} ({done}/{total})"
@@ -0,0 +1,141 @@
+"""Output formats: plain CSV, zstd-compressed CSV and Parquet
+
+Outputs are named as CSVs throughout the pipeline; ``output_name`` swaps
+the extension for the chosen format. zstd needs the ``zstandard`` package
+and Parquet needs ``pyarrow``; both are optional. Parquet outputs hold
+every column as text with '' for empty cells, exactly what their CSV
+holds, whether written from a frame or streamed from a CSV.
+"""
+import importlib.util
+import os
+
+FORMATS = ("csv", "csv.zst", "parquet")
+
+EXTENSIONS = {"csv": ".csv", "csv.zst": ".csv.zst", "parquet": ".parquet"}
+
+MIMETYPES = {
+    ".csv": "text/csv",
+    ".zst": "application/zstd",
+    ".parquet": "application/vnd.apache.parquet",
+}
+
+_MODULES = {"csv.zst": "zstandard", "parquet": "pyarrow"}
+
+
+def format_available(output_format):
+    module = _MODULES.get(output_format)
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def available_formats():
+    return [output_format for output_format in FORMATS if format_available(output_format)]
+
+
+def check_format(output_format):
+    """Raise if output_format is unknown or its optional dependency is missing"""
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(FORMATS)}")
+    if not format_available(output_format):
+        module = _MODULES[output_format]
+        raise ImportError(f"The {output_format} output format needs {module}: pip install {module}")
+
+
+def output_name(csv_name, output_format):
+    """File name of an output named csv_name, written in output_format"""
+    return os.path.splitext(csv_name)[0] + EXTENSIONS[output_format]
+
+
+def mimetype(name):
+    return MIMETYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+
+
+def is_compressed(name):
+    """Whether a file is compressed already, so a ZIP should store it as it is"""
+    return os.path.splitext(name)[1] in (".zst", ".parquet")
+
+
+def _text_table(df):
+    """Arrow table of df's cells as its CSV writes them: text, '' where missing"""
+    import pyarrow as pa
+
+    arrays = []
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i]
+        text = values.where(values.notna(), '').astype(str)
+        arrays.append(pa.array(text.to_numpy(dtype=object), type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+
+
+def write_frame(df, target, output_format="csv"):
+    """Write df to a path or binary file in output_format"""
+    if output_format == "parquet":
+        from pyarrow import parquet
+
+        parquet.write_table(_text_table(df), target)
+    elif output_format == "csv.zst":
+        df.to_csv(target, index=False, compression={"method": "zstd"})
+    else:
+        df.to_csv(target, index=False)
+
+
+def _read_parquet_chunks(source, chunksize):
+    from pyarrow import parquet
+
+    for batch in parquet.ParquetFile(source).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas().fillna('').astype(str)
+
+
+def read_frame(source, output_format="csv", chunksize=None):
+    """Read an output written in output_format back with every cell as text, '' where empty
+
+    With ``chunksize``, returns an iterator of frames of up to that many
+    rows instead, so outputs too large to load can be read.
+    """
+    import pandas as pd
+
+    if output_format == "parquet":
+        if chunksize:
+            return _read_parquet_chunks(source, chunksize)
+        return pd.read_parquet(source, engine="pyarrow").fillna('').astype(str)
+    compression = "zstd" if output_format == "csv.zst" else None
+    return pd.read_csv(source, dtype=str, keep_default_na=False, compression=compression, chunksize=chunksize)
+
+
+def _csv_to_parquet(csv_path, path):
+    """Stream a CSV into Parquet with every column as text, as ``write_frame`` writes it"""
+    import pandas as pd
+    from pyarrow import csv, parquet, string
+
+    # Take the header from pandas so duplicate names are renamed the same way
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    reader = csv.open_csv(
+        csv_path,
+        read_options=csv.ReadOptions(column_names=columns, skip_rows=1),
+        # Empty cells stay '', as in the CSV
+        convert_options=csv.ConvertOptions(
+            column_types={col: string() for col in columns}, strings_can_be_null=False
+        ),
+    )
+    with parquet.ParquetWriter(path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+def convert_csv(csv_path, output_format):
+    """Convert a CSV written by the pipeline to output_format, returning the new path
+
+    The CSV is streamed, so this works for outputs too large to load, and
+    removed once converted.
+    """
+    if output_format == "csv":
+        return csv_path
+    path = output_name(csv_path, output_format)
+    if output_format == "parquet":
+        _csv_to_parquet(csv_path, path)
+    else:
+        import zstandard
+
+        with open(csv_path, 'rb') as src, open(path, 'wb') as dst:
+            zstandard.ZstdCompressor().copy_stream(src, dst)
+    os.remove(csv_path)
+    return path
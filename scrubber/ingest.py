@@ -0,0 +1,173 @@
+"""CSV ingestion with pinned text dtypes and an optional pyarrow engine
+
+Every column is read as text, so pandas never scans values to infer
+types, phone numbers keep their digits instead of turning into float64,
+and chunked reads give the same frames as whole-file reads. The pyarrow
+engine parses on several threads; it handles whole-file reads only, since
+it supports neither chunks nor row ranges. Row ranges of large logs are
+byte ranges that end on row boundaries, so reading one seeks straight to
+its rows instead of parsing every row before it.
+"""
+import importlib.util
+import io
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# The only list file columns the scrub itself needs
+LIST_COLUMNS = ["Log Type", "Phone"]
+
+ENGINES = ("auto", "c", "pyarrow")
+
+# pandas' default NA strings, so both engines read the same cells as missing
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "n/a", "nan", "null",
+]
+
+
+def pyarrow_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def resolve_engine(engine="auto"):
+    """Pick the CSV engine: "auto" uses pyarrow when it is installed"""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    if engine == "auto":
+        return "pyarrow" if pyarrow_available() else "c"
+    if engine == "pyarrow" and not pyarrow_available():
+        raise ImportError("The pyarrow CSV engine needs pyarrow: pip install pyarrow")
+    return engine
+
+
+def _read_pyarrow(path, usecols=None):
+    """Read a whole CSV as text with pyarrow, or None if pyarrow can't parse it"""
+    from pyarrow import ArrowInvalid, csv, string
+
+    # Take the header from pandas so duplicate names are renamed the same way
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    if usecols is not None:
+        if not set(usecols) <= set(columns):
+            # Leave the missing-column error to pandas
+            return None
+        # Keep file order, as pandas does
+        usecols = [col for col in columns if col in usecols]
+    try:
+        table = csv.read_csv(
+            path,
+            read_options=csv.ReadOptions(column_names=columns, skip_rows=1),
+            convert_options=csv.ConvertOptions(
+                column_types={col: string() for col in columns},
+                null_values=NA_VALUES,
+                strings_can_be_null=True,
+                include_columns=usecols,
+            ),
+        )
+    except ArrowInvalid:
+        # Ragged rows and other shapes pandas tolerates
+        return None
+    return table.to_pandas()
+
+
+def read_list(path, columns=LIST_COLUMNS, engine="auto"):
+    """Read a list CSV as text, only the given columns (None reads them all)"""
+    if resolve_engine(engine) == "pyarrow":
+        list_df = _read_pyarrow(path, columns)
+        if list_df is not None:
+            return list_df
+    return pd.read_csv(path, dtype=str, usecols=columns)
+
+
+def read_log(path, chunksize=None, nrows=None, engine="auto"):
+    """Read a log CSV keeping every column as text, whole or in chunks
+
+    ``nrows`` reads only the first rows. Chunked and partial reads always
+    use the C engine.
+    """
+    if not (chunksize or nrows) and resolve_engine(engine) == "pyarrow":
+        log_df = _read_pyarrow(path)
+        if log_df is not None:
+            return log_df
+    return pd.read_csv(path, dtype=str, chunksize=chunksize, nrows=nrows)
+
+
+def row_boundaries(path, every):
+    """Byte offsets just past every ``every``-th data row of a CSV, before its end
+
+    Rows end at newlines outside quoted fields; quotes are counted with
+    NumPy a block at a time, so this is a single pass at disk speed.
+    """
+    offsets = []
+    rows = -1  # The header's line ends first
+    quoted = 0
+    position = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            data = np.frombuffer(block, dtype=np.uint8)
+            # Odd where a byte sits inside quotes; doubled quotes cancel out
+            parity = (np.cumsum(data == ord('"')) + quoted) & 1
+            ends = np.flatnonzero((data == ord('\n')) & (parity == 0))
+            numbers = rows + 1 + np.arange(len(ends))
+            picked = ends[(numbers > 0) & (numbers % every == 0)]
+            offsets.extend((position + picked + 1).tolist())
+            rows += len(ends)
+            quoted = int(parity[-1])
+            position += len(block)
+    return [offset for offset in offsets if offset < position]
+
+
+class _ByteRange(io.RawIOBase):
+    """Binary reader over length bytes of an open file, from its current position"""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._left = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._left)
+        if size <= 0:
+            return 0
+        read = self._f.readinto(memoryview(buffer)[:size])
+        self._left -= read
+        return read
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+@contextmanager
+def open_byte_range(path, start, end=None):
+    """Binary file over the bytes [start, end) of path, to the end without ``end``"""
+    f = open(path, 'rb')
+    f.seek(start)
+    handle = f if end is None else io.BufferedReader(_ByteRange(f, end - start))
+    try:
+        yield handle
+    finally:
+        handle.close()
+        f.close()
+
+
+def read_log_range(path, start, end=None, chunksize=None):
+    """Yield the rows of a byte range from ``row_boundaries`` as one frame, or in chunks
+
+    Only the range at offset 0 holds the header; later ones take their
+    column names from the file's first line. Frames match those of the
+    same rows in a whole-file read.
+    """
+    header = {}
+    if start:
+        header = {"header": None, "names": list(pd.read_csv(path, nrows=0).columns)}
+    with open_byte_range(path, start, end) as handle:
+        frames = pd.read_csv(handle, dtype=str, chunksize=chunksize, **header)
+        if chunksize is None:
+            yield frames
+            return
+        with frames:
+            yield from frames
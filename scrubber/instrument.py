@@ -0,0 +1,137 @@
+"""Per-stage instrumentation: duration, row counts and memory of each pipeline stage
+
+A RunReport times stages wrapped in ``report.stage(name, rows=...)``,
+reads the process's resident set size (RSS) before and after each one, and
+reports a one-line summary through the progress callback. ``save`` writes
+the whole run as JSON.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _psutil_process():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process()
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it can't be read"""
+    process = _psutil_process()
+    if process is not None:
+        return process.memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_age():
+    """Seconds since this process started, or None without psutil"""
+    process = _psutil_process()
+    if process is None:
+        return None
+    return round(time.time() - process.create_time(), 4)
+
+
+def _mb(size):
+    return None if size is None else round(size / 2 ** 20, 1)
+
+
+def describe_stage(record):
+    """Status line for a finished stage record"""
+    text = record["name"]
+    if record.get("file"):
+        text += f" {record['file']}"
+    text += f": {record['seconds']:.2f}s"
+    if record.get("rows") is not None:
+        text += f", {record['rows']:,} rows"
+        if record.get("rows_per_sec"):
+            text += f" ({record['rows_per_sec']:,}/s)"
+    if record.get("rss_mb") is not None:
+        text += f", RSS {record['rss_mb']:.0f} MB"
+        if record.get("rss_delta_mb") is not None:
+            text += f" ({record['rss_delta_mb']:+.0f} MB)"
+    return text
+
+
+def scaled_progress(progress, start, end):
+    """Progress callback mapping the 0-100 percentages of a step onto start-end"""
+    def scaled(message, percent=None):
+        progress(message, None if percent is None else start + percent * (end - start) / 100)
+    return scaled
+
+
+class RunReport:
+    """Stage timings, row counts and RSS of one run"""
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.started = datetime.now()
+        self.stages = []
+        self.files = []
+        # Named statistics such as cache hit rates
+        self.counters = {}
+        self.peak_rss = rss_bytes()
+        self._start = time.perf_counter()
+
+    def _sample_rss(self):
+        rss = rss_bytes()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+        return rss
+
+    @contextmanager
+    def stage(self, name, rows=None, **details):
+        """Time the wrapped block as a stage; the yielded record can be updated, e.g. its rows"""
+        record = dict(name=name, rows=rows, **details)
+        rss_before = self._sample_rss()
+        start = time.perf_counter()
+        yield record
+        self.record(record, time.perf_counter() - start, rss_before)
+
+    def record(self, record, seconds, rss_before=None):
+        """Add a stage timed by the caller, e.g. one that runs on other threads"""
+        rss = self._sample_rss()
+        record["seconds"] = round(seconds, 4)
+        if record.get("rows") is not None and seconds > 0:
+            record["rows_per_sec"] = round(record["rows"] / seconds)
+        record["rss_mb"] = _mb(rss)
+        record["rss_delta_mb"] = _mb(rss - rss_before) if rss is not None and rss_before is not None else None
+        self.stages.append(record)
+        if self.progress is not None:
+            self.progress(describe_stage(record))
+
+    def file_done(self, name, rows, removed, **details):
+        """Note a log file finished, with its row counts and when it finished"""
+        self.files.append(dict(
+            name=name,
+            rows=rows,
+            removed=removed,
+            finished_after=round(time.perf_counter() - self._start, 4),
+            **details
+        ))
+
+    def to_dict(self):
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self._start, 4),
+            "peak_rss_mb": _mb(self.peak_rss),
+            "stages": self.stages,
+            "files": self.files,
+            "counters": self.counters,
+        }
+
+    def save(self, path):
+        """Write the report as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
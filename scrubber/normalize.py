@@ -0,0 +1,337 @@
+"""Phone number normalization shared by the list and log paths
+
+Phone columns repeat the same numbers many times, so each column is
+factorized and every distinct value goes through one scalar pass that
+repairs float text, strips it to digits and encodes the int64 key; the
+results are mapped back to the rows with the factorized codes.
+"""
+import re
+from collections import namedtuple
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+# A phone column as repaired text (what the outputs show), normalized digits
+# and the int64 keys of those digits (what grouping and lookups run on)
+NormalizedColumn = namedtuple("NormalizedColumn", "repaired digits keys")
+
+_NON_DIGIT = re.compile(r'\D')
+
+
+def _clean_text(phone):
+    # \D removes exactly what str.isdecimal() rejects, so clean text skips the regex
+    if not phone.isdecimal():
+        phone = _NON_DIGIT.sub('', phone)
+    if len(phone) > 10 and phone[0] == '1':
+        phone = phone[1:]
+    return phone
+
+
+def clean_number(phone):
+    """Clean and standardize a single phone number"""
+    return _clean_text(str(phone))
+
+
+def _repair_one(value):
+    """Turn float text such as '5551234567.0' back into integer text"""
+    # Plain ASCII integers that a float holds exactly only lose their leading zeros
+    if value.isdigit() and value.isascii() and len(value) <= 15:
+        return value.lstrip('0') or '0'
+    if value.replace('.', '').isdigit():
+        try:
+            return f"{int(float(value))}"
+        except (ValueError, OverflowError):
+            pass
+    return value
+
+
+def _phone_key(digits):
+    """int64 key of normalized digits, INVALID_KEY if they can't be encoded"""
+    if not digits:
+        return 0
+    if len(digits) <= KEY_DIGITS and digits.isascii():
+        return len(digits) * _LENGTH_BASE + int(digits)
+    return INVALID_KEY
+
+
+def _object_array(items, size):
+    array = np.empty(size, dtype=object)
+    array[:] = items
+    return array
+
+
+def _factorize_text(values):
+    """Codes of a column's values as text and its distinct values"""
+    codes, uniques = pd.factorize(values.astype(str), sort=False)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _map_distinct(values, function):
+    """Series of function applied once per distinct text value of values"""
+    codes, uniques = _factorize_text(values)
+    mapped = _object_array([function(value) for value in uniques], len(uniques))
+    return pd.Series(mapped[codes], index=values.index, name=values.name)
+
+
+def normalize_distinct(uniques):
+    """Repaired text, digits and keys of distinct text values, one scalar pass each"""
+    repaired = [_repair_one(value) for value in uniques]
+    digits = [_clean_text(value) for value in repaired]
+    return (
+        _object_array(repaired, len(repaired)),
+        _object_array(digits, len(digits)),
+        np.fromiter(map(_phone_key, digits), dtype=np.int64, count=len(digits)),
+    )
+
+
+def normalize_phones(values):
+    """Apply clean_number to a whole Series, once per distinct value"""
+    return _map_distinct(values, _clean_text)
+
+
+def repair_float_text(values):
+    """Undo float coercion of a phone column ('5551234567.0' -> '5551234567')
+
+    Matches the per-value ``int(float(x))`` repair for every value whose
+    text is digits with an optional decimal point; other values are kept.
+    """
+    return _map_distinct(values, _repair_one)
+
+
+def normalize_phone_column(values, cache=None):
+    """NormalizedColumn of a phone column, through a NormalizationCache if given"""
+    if cache is not None:
+        return cache.normalize_keys(values)
+    codes, uniques = _factorize_text(values)
+    repaired, digits, keys = normalize_distinct(uniques)
+    return NormalizedColumn(
+        pd.Series(repaired[codes], index=values.index, name=values.name),
+        pd.Series(digits[codes], index=values.index, name=values.name),
+        keys[codes],
+    )
+
+
+class NormalizationCache:
+    """Bounded memo of phone text to its repaired text, normalized digits and key
+
+    Each column is factorized so every distinct value is normalized once,
+    and distinct values already seen in earlier columns or files are looked
+    up instead. Entries sit in preallocated arrays of ``max_entries`` slots
+    with a dict from value to slot. Every lookup marks the slots it used
+    with a new epoch, and once the slots run out the least recently used
+    entries are evicted, an eighth of the slots at a time, to make room.
+
+    Once the slots are full, a value is only stored the second time it
+    misses: first sightings just set a bit in a hashed bitmap, cleared
+    every ``2 * max_entries`` values. Numbers that appear once in a whole
+    run, most of a typical log, then cost a lookup but never an insert and
+    an eviction.
+
+    Lookups cost more than they save when few values are found, so a
+    column whose distinct values are less than ``min_hit_share`` found
+    sends the next column straight to normalization, bypassing the cache.
+    Each further low share doubles the columns bypassed, up to
+    ``MAX_BYPASS``, before the cache is tried again. ``max_entries=0``
+    bypasses it for every column.
+    """
+
+    MAX_BYPASS = 32
+
+    def __init__(self, max_entries=250000, min_hit_share=0.25):
+        self.max_entries = max_entries
+        self.min_hit_share = min_hit_share
+        self._slots = {}
+        # Cached values, their repaired text, digits and keys, and the epoch they were last used, by slot
+        self._values = np.empty(max_entries, dtype=object)
+        self._repaired = np.empty(max_entries, dtype=object)
+        self._digits = np.empty(max_entries, dtype=object)
+        self._keys = np.empty(max_entries, dtype=np.int64)
+        self._used = np.zeros(max_entries, dtype=np.int64)
+        self._epoch = 0
+        # Slots handed out so far, and emptied ones not yet reused
+        self._filled = 0
+        self._spare = np.empty(0, dtype=np.int64)
+        # Hashed bitmap of values that missed once, and how many it has taken
+        self._seen = np.zeros(max(8 * max_entries, 1), dtype=bool)
+        self._sightings = 0
+        # Columns still to bypass, and how many the last low hit share bypassed
+        self._bypass = 0
+        self._backoff = 0
+        self.cells = 0
+        self.distinct = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _free_slots(self, count):
+        """Up to count empty slots, evicting the least recently used entries once all are taken"""
+        count = min(count, self.max_entries)
+        slots = self._spare[:count]
+        self._spare = self._spare[count:]
+        fresh = min(count - len(slots), self.max_entries - self._filled)
+        slots = np.concatenate([slots, np.arange(self._filled, self._filled + fresh)])
+        self._filled += fresh
+        self._used[slots] = self._epoch
+        needed = count - len(slots)
+        if needed <= 0:
+            return slots
+        # Never evict what the current lookup used or was handed; those slots hold the newest epoch
+        evict = min(max(needed, self.max_entries // 8), int((self._used < self._epoch).sum()))
+        if evict:
+            evicted = np.argpartition(self._used, evict - 1)[:evict]
+            for value in self._values[evicted]:
+                del self._slots[value]
+            self._values[evicted] = None
+            slots = np.concatenate([slots, evicted[:needed]])
+            self._spare = evicted[needed:]
+        return slots
+
+    def _admit(self, misses):
+        """Which misses were seen before and should be stored, remembering the rest"""
+        buckets = np.fromiter(map(hash, misses), dtype=np.int64, count=len(misses)) % len(self._seen)
+        admit = self._seen[buckets]
+        self._sightings += len(misses)
+        # Cleared while at most a quarter of the bits are set, so few first sightings pass as repeats
+        if self._sightings > len(self._seen) // 4:
+            self._seen[:] = False
+            self._sightings = 0
+        else:
+            self._seen[buckets] = True
+        return admit
+
+    def _measure(self, hits, distinct):
+        """Bypass the cache for the next columns while lookups find too little"""
+        if hits < self.min_hit_share * distinct:
+            self._backoff = min(max(2 * self._backoff, 1), self.MAX_BYPASS)
+            self._bypass = self._backoff
+        else:
+            self._backoff = 0
+
+    def _lookup(self, values):
+        """Codes of values and the repaired text, digits and key of each distinct value"""
+        codes, uniques = _factorize_text(values)
+        self.cells += len(codes)
+        self.distinct += len(uniques)
+        if self._bypass or not self.max_entries:
+            self._bypass = max(self._bypass - 1, 0)
+            return (codes, *normalize_distinct(uniques))
+        # An empty cache finds nothing, so only lookups into a filled one measure the hit share
+        measured = bool(self._slots)
+        self._epoch += 1
+        positions = np.fromiter(map(self._slots.get, uniques, repeat(-1)), dtype=np.int64, count=len(uniques))
+        cached = positions >= 0
+        hits = positions[cached]
+        self._used[hits] = self._epoch
+        repaired = np.empty(len(uniques), dtype=object)
+        digits = np.empty(len(uniques), dtype=object)
+        keys = np.empty(len(uniques), dtype=np.int64)
+        repaired[cached] = self._repaired[hits]
+        digits[cached] = self._digits[hits]
+        keys[cached] = self._keys[hits]
+
+        misses = uniques[~cached]
+        if len(misses):
+            new_repaired, new_digits, new_keys = normalize_distinct(misses)
+            repaired[~cached] = new_repaired
+            digits[~cached] = new_digits
+            keys[~cached] = new_keys
+            admit = self._admit(misses)
+            # Until the slots run out nothing has to be evicted, so first sightings are stored too
+            room = self.max_entries - self._filled + len(self._spare)
+            admit[np.flatnonzero(~admit)[:room]] = True
+            slots = self._free_slots(int(admit.sum()))
+            stored = np.flatnonzero(admit)[:len(slots)]
+            if len(stored):
+                self._values[slots] = misses[stored]
+                self._repaired[slots] = new_repaired[stored]
+                self._digits[slots] = new_digits[stored]
+                self._keys[slots] = new_keys[stored]
+                self._used[slots] = self._epoch
+                self._slots.update(zip(misses[stored].tolist(), slots.tolist()))
+
+        self.hits += int(cached.sum())
+        if measured and len(uniques):
+            self._measure(len(hits), len(uniques))
+        return codes, repaired, digits, keys
+
+    def normalize(self, values):
+        """(repaired text, normalized digits) of a phone column, both aligned with values"""
+        codes, repaired, digits, _ = self._lookup(values)
+        return (
+            pd.Series(repaired[codes], index=values.index, name=values.name),
+            pd.Series(digits[codes], index=values.index, name=values.name),
+        )
+
+    def normalize_keys(self, values):
+        """NormalizedColumn of a phone column, aligned with values"""
+        codes, repaired, digits, keys = self._lookup(values)
+        return NormalizedColumn(
+            pd.Series(repaired[codes], index=values.index, name=values.name),
+            pd.Series(digits[codes], index=values.index, name=values.name),
+            keys[codes],
+        )
+
+    def stats(self):
+        """Cells seen, distinct values per column, how many were cached and how many normalized"""
+        return {
+            "cells": self.cells,
+            "distinct": self.distinct,
+            "hits": self.hits,
+            "normalized": self.distinct - self.hits,
+        }
+
+    def take_stats(self):
+        """stats() since the last call, for worker processes reporting back"""
+        stats = self.stats()
+        self.cells = self.distinct = self.hits = 0
+        return stats
+
+    def add_stats(self, stats):
+        """Count the work of another process's cache"""
+        self.cells += stats["cells"]
+        self.distinct += stats["distinct"]
+        self.hits += stats["hits"]
+
+    def describe(self):
+        """Status line of how much normalization the cache saved"""
+        normalized = self.distinct - self.hits
+        saved = 1 - normalized / self.cells if self.cells else 0
+        return (f"Normalization cache: {self.cells:,} phone cells, {self.distinct:,} distinct per column, "
+                f"{self.hits:,} found in the cache, {normalized:,} normalized ({saved:.0%} of cells skipped)")
+
+
+# Normalized numbers are encoded as int64 keys of the form
+# ``len(digits) * 10**17 + int(digits)`` so that leading zeros survive and
+# '' maps to 0. Anything longer than 17 digits (or not plain ASCII digits)
+# cannot be encoded and gets INVALID_KEY; group_keys gives those their own
+# negative ids where numbers are grouped.
+KEY_DIGITS = 17
+INVALID_KEY = -1
+_LENGTH_BASE = 10 ** KEY_DIGITS
+
+
+def phone_keys(numbers):
+    """Encode a Series of normalized numbers as an int64 key array"""
+    codes, uniques = _factorize_text(numbers)
+    keys = np.fromiter((_phone_key(digits) for digits in uniques), dtype=np.int64, count=len(uniques))
+    return keys[codes]
+
+
+def group_keys(keys, numbers):
+    """Keys that group numbers exactly, and the numbers behind their negative ids
+
+    Each distinct number that has no key (INVALID_KEY) is given its own id
+    below INVALID_KEY: -2, -3 and so on, standing for the numbers returned
+    at positions 0, 1, ... ``numbers`` holds the normalized text of every
+    key and is only read where a key is missing.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    invalid = keys == INVALID_KEY
+    if not invalid.any():
+        return keys, np.empty(0, dtype=object)
+    codes, overflow = pd.factorize(np.asarray(numbers, dtype=object)[invalid])
+    keys = keys.copy()
+    keys[invalid] = INVALID_KEY - 1 - codes
+    return keys, np.asarray(overflow, dtype=object)
@@ -0,0 +1,166 @@
+"""On-disk occurrence counts of list file numbers, updated incrementally
+
+The store keeps one count per (log type, normalized phone) in SQLite and
+remembers how far into the list file it has read. List files only grow by
+appended rows, so each run parses just the rows added since the last one.
+If the header or the bytes just before the saved offset changed, or a
+different list file is given, the counts are rebuilt from scratch.
+"""
+import hashlib
+import os
+import sqlite3
+
+import pandas as pd
+
+from .conditions import parse_rules
+from .ingest import LIST_COLUMNS
+from .normalize import group_keys, normalize_phones, phone_keys, repair_float_text
+from .pipeline import apply_conditions, clean_df, no_progress
+
+# Bytes before the saved offset that must be unchanged to resume from it
+CHECK_BYTES = 1024 * 1024
+
+INGEST_CHUNKSIZE = 500000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    log_type TEXT NOT NULL,
+    type_key TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (log_type, phone)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_by_type ON counts (type_key, count);
+CREATE TABLE IF NOT EXISTS source (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    path TEXT NOT NULL,
+    header BLOB NOT NULL,
+    offset INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    check_hash TEXT NOT NULL
+);
+"""
+
+_UPSERT = """
+INSERT INTO counts (log_type, type_key, phone, count) VALUES (?, ?, ?, ?)
+ON CONFLICT (log_type, phone) DO UPDATE SET count = count + excluded.count
+"""
+
+
+def _check_hash(f, offset):
+    """Hash of the CHECK_BYTES bytes that end at offset"""
+    start = max(offset - CHECK_BYTES, 0)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+
+class OccurrenceStore:
+    """SQLite occurrence counts of one list file
+
+    Counts are kept per log type as written, like the groupby in
+    ``prepare_list``; threshold queries match log types title-cased, the
+    same way conditions are applied.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    @property
+    def rows(self):
+        """List file rows counted so far"""
+        row = self._db.execute("SELECT rows FROM source").fetchone()
+        return row[0] if row else 0
+
+    def _resume_offset(self, path, header, size, f):
+        """Offset to continue reading the list file from, 0 to rebuild"""
+        row = self._db.execute("SELECT path, header, offset, check_hash FROM source").fetchone()
+        if row is None:
+            return 0
+        stored_path, stored_header, offset, check_hash = row
+        if stored_path != path or stored_header != header or size < offset:
+            return 0
+        return offset if _check_hash(f, offset) == check_hash else 0
+
+    def _add(self, chunk):
+        """Add the counts of a chunk of list rows"""
+        chunk = clean_df(chunk)
+        phones = normalize_phones(repair_float_text(chunk["Phone"]))
+        counts = pd.DataFrame({"Log Type": chunk["Log Type"], "Phone": phones}).groupby(["Log Type", "Phone"]).size()
+        self._db.executemany(
+            _UPSERT,
+            ((log_type, log_type.title(), phone, int(count)) for (log_type, phone), count in counts.items())
+        )
+
+    def ingest(self, list_file, progress=no_progress, chunksize=INGEST_CHUNKSIZE):
+        """Count the list rows added since the last ingest, returning how many were read"""
+        path = os.path.abspath(list_file)
+        with open(path, 'rb') as f:
+            header = f.readline()
+            size = os.fstat(f.fileno()).st_size
+            offset = self._resume_offset(path, header, size, f)
+            if offset == size:
+                progress(f"Occurrence store is up to date with {self.rows} list rows")
+                return 0
+
+            rows = self.rows if offset else 0
+            if offset:
+                progress(f"Reading list rows appended since the last run ({size - offset} bytes)")
+                columns = list(pd.read_csv(path, nrows=0).columns)
+                f.seek(offset)
+                reader = pd.read_csv(f, header=None, names=columns, usecols=LIST_COLUMNS, dtype=str,
+                                     chunksize=chunksize)
+            else:
+                progress("Building the occurrence store from the whole list file")
+                f.seek(0)
+                reader = pd.read_csv(f, usecols=LIST_COLUMNS, dtype=str, chunksize=chunksize)
+
+            added = 0
+            # One transaction: an interrupted ingest leaves the store as it was
+            with self._db:
+                if not offset:
+                    self._db.execute("DELETE FROM counts")
+                with reader:
+                    for chunk in reader:
+                        self._add(chunk)
+                        added += len(chunk)
+                        progress(f"Counted {added} new list rows")
+                end = f.tell()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO source VALUES (1, ?, ?, ?, ?, ?)",
+                    (path, header, end, rows + added, _check_hash(f, end))
+                )
+        return added
+
+    def occurrences(self, log_types):
+        """Occurrence table of the stored counts under the given (title-cased) log types"""
+        log_types = sorted({log_type.title() for log_type in log_types})
+        placeholders = ", ".join("?" * len(log_types))
+        return pd.read_sql_query(
+            f'SELECT log_type AS "Log Type", phone AS "Phone", count AS occurrence '
+            f'FROM counts WHERE type_key IN ({placeholders})',
+            self._db, params=log_types
+        )
+
+    def suppression(self, conditions, progress=no_progress):
+        """SuppressionIndex of the numbers matching the conditions, as ``prepare_list`` builds it
+
+        Stored counts cover the whole list, so conditions with a date
+        window aren't supported here.
+        """
+        rules = parse_rules(conditions)
+        if any(rule.window for rule in rules):
+            raise ValueError("Conditions with a date window can't use the occurrence store")
+        occurrences = self.occurrences(log_type for rule in rules for log_type in rule.types)
+        occurrences["Phone"], overflow = group_keys(phone_keys(occurrences["Phone"]), occurrences["Phone"])
+        return apply_conditions(occurrences, conditions, progress=progress, overflow=overflow)
@@ -0,0 +1,112 @@
+"""Output stage: serialize each result once and share the bytes between Drive and the ZIP"""
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+
+from .formats import is_compressed, output_name, write_frame
+from .pipeline import removed_records_name, scrubbed_log_name, updated_list_name
+
+# Outputs estimated above this size are written to a temp file instead of memory
+SPOOL_THRESHOLD = 32 * 1024 * 1024
+
+
+def collect_outputs(updated_list_df, updated_log_dfs, removed_log_records, log_names, current_date):
+    """List (kind, name, DataFrame) for every output, in upload and ZIP order
+
+    ``kind`` is "list", "scrubbed" or "removed"; empty removed-records
+    tables are left out.
+    """
+    outputs = [("list", updated_list_name(current_date), updated_list_df)]
+    for log_df, rem_df, log_name in zip(updated_log_dfs, removed_log_records, log_names):
+        outputs.append(("scrubbed", scrubbed_log_name(log_name, current_date), log_df))
+        if not rem_df.empty:
+            outputs.append(("removed", removed_records_name(log_name, current_date), rem_df))
+    return outputs
+
+
+class OutputFile:
+    """An output serialized exactly once, held as bytes or in a temp file"""
+
+    def __init__(self, name, kind, data=None, path=None):
+        self.name = name
+        self.kind = kind
+        self.data = data
+        self.path = path
+
+    @classmethod
+    def from_frame(cls, name, kind, df, spool_threshold=SPOOL_THRESHOLD, output_format="csv"):
+        """Write df in output_format, spooling to a temp file when it is estimated to be large
+
+        ``name`` is the CSV name; its extension is replaced to match the format.
+        """
+        name = output_name(name, output_format)
+        if df.memory_usage(index=False, deep=True).sum() <= spool_threshold:
+            buffer = BytesIO()
+            write_frame(df, buffer, output_format)
+            return cls(name, kind, data=buffer.getvalue())
+
+        with tempfile.NamedTemporaryFile(prefix='scrubber-', suffix=os.path.splitext(name)[1], delete=False) as f:
+            write_frame(df, f, output_format)
+        return cls(name, kind, path=f.name)
+
+    @classmethod
+    def from_file(cls, name, kind, path, spool_threshold=SPOOL_THRESHOLD):
+        """Copy an already serialized output, e.g. from the result cache, so it can't change underneath"""
+        if os.path.getsize(path) <= spool_threshold:
+            with open(path, 'rb') as f:
+                return cls(name, kind, data=f.read())
+
+        with tempfile.NamedTemporaryFile(prefix='scrubber-', suffix=os.path.splitext(name)[1], delete=False) as f:
+            pass
+        try:
+            shutil.copyfile(path, f.name)
+        except BaseException:
+            os.remove(f.name)
+            raise
+        return cls(name, kind, path=f.name)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.path else len(self.data)
+
+    def source(self):
+        """Bytes or file path for DriveUploader; every reader gets its own handle"""
+        return self.path or self.data
+
+    def open(self):
+        """Fresh binary reader over the serialized output"""
+        return open(self.path, 'rb') if self.path else BytesIO(self.data)
+
+    def close(self):
+        """Delete the temp file, if any"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def serialize_outputs(updated_list_df, updated_log_dfs, removed_log_records, log_names, current_date,
+                      spool_threshold=SPOOL_THRESHOLD, output_format="csv"):
+    """Serialize every output once, returning OutputFiles in upload and ZIP order"""
+    return [
+        OutputFile.from_frame(name, kind, df, spool_threshold, output_format)
+        for kind, name, df in collect_outputs(
+            updated_list_df, updated_log_dfs, removed_log_records, log_names, current_date
+        )
+    ]
+
+
+def write_zip(outputs, path):
+    """Stream OutputFiles into a ZIP at path without buffering the archive
+
+    CSVs are DEFLATE-compressed; zstd CSVs and Parquet files are compressed
+    already and stored as they are.
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for output in outputs:
+            info = zipfile.ZipInfo(output.name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED if is_compressed(output.name) else zipfile.ZIP_DEFLATED
+            force_zip64 = output.size >= zipfile.ZIP64_LIMIT
+            with output.open() as src, zip_file.open(info, 'w', force_zip64=force_zip64) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
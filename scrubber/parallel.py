@@ -0,0 +1,187 @@
+"""Process-pool scrubbing across log files and row ranges of large logs
+
+The suppression index is written once as a .npy file that every worker
+memory-maps read-only, so its pages are shared instead of pickled per task.
+Each worker keeps its own NormalizationCache for the run and sends its
+statistics back with every result. Phone columns are decided in the main
+process before the pool starts, and every worker gets a copy of those
+decisions, so all row ranges of a log scrub the same columns.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .ingest import read_log, read_log_range, row_boundaries
+from .normalize import NormalizationCache
+from .pipeline import scrub_chunks, scrub_log, scrub_log_file, write_removed_records
+from .suppression import SuppressionIndex
+
+# Suppression index, normalization cache and column classifier of the
+# current worker process, set by _init_worker
+_suppression = None
+_normalization_cache = None
+_column_classifier = None
+
+
+def _init_worker(keys_path, overflow, cache_entries, column_classifier):
+    global _suppression, _normalization_cache, _column_classifier
+    _suppression = SuppressionIndex.from_sorted(np.load(keys_path, mmap_mode='r'), overflow)
+    if cache_entries is not None:
+        _normalization_cache = NormalizationCache(cache_entries)
+    _column_classifier = column_classifier
+
+
+def _with_stats(result):
+    """A task's result with the normalization statistics of the work behind it"""
+    return result, _normalization_cache.take_stats() if _normalization_cache is not None else None
+
+
+def _add_stats(normalization_cache, stats):
+    if normalization_cache is not None and stats is not None:
+        normalization_cache.add_stats(stats)
+
+
+def _scrub_frame(log_df, filename):
+    return _with_stats(scrub_log(log_df, _suppression, filename, normalization_cache=_normalization_cache,
+                                 column_classifier=_column_classifier))
+
+
+def _scrub_file(path, scrubbed_path, removed_path, chunksize, log_name, engine):
+    return _with_stats(scrub_log_file(path, _suppression, scrubbed_path, removed_path, chunksize, log_name,
+                                      engine=engine, normalization_cache=_normalization_cache,
+                                      column_classifier=_column_classifier))
+
+
+def _scrub_rows(path, start, end, part_dir, chunksize, log_name):
+    return _with_stats(scrub_row_range(path, start, end, part_dir, _suppression, chunksize, log_name,
+                                       _normalization_cache, _column_classifier))
+
+
+def _pool(suppression, work_dir, workers, normalization_cache=None, column_classifier=None):
+    keys_path = os.path.join(work_dir, 'suppression.npy')
+    np.save(keys_path, np.asarray(suppression.keys))
+    cache_entries = normalization_cache.max_entries if normalization_cache is not None else None
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(keys_path, tuple(suppression.overflow), cache_entries, column_classifier),
+    )
+
+
+def scrub_row_range(path, start, end, part_dir, suppression, chunksize=None, log_name='',
+                    normalization_cache=None, column_classifier=None):
+    """Scrub one byte range of a log into part_dir; only the first range writes the header
+
+    Returns ``scrub_chunks``' (rows, removed, columns, spools) for
+    ``merge_row_ranges``.
+    """
+    os.makedirs(part_dir, exist_ok=True)
+    scrubbed_path = os.path.join(part_dir, 'scrubbed.csv')
+    with closing(read_log_range(path, start, end, chunksize)) as frames:
+        return scrub_chunks(frames, suppression, scrubbed_path, part_dir, start == 0, log_name,
+                            normalization_cache=normalization_cache, column_classifier=column_classifier)
+
+
+def plan_row_ranges(path, split_rows):
+    """Split a log into (start, end) byte ranges of split_rows rows; the last one reads to the end"""
+    if not split_rows:
+        return [(0, None)]
+    offsets = row_boundaries(path, split_rows)
+    return list(zip([0] + offsets, offsets + [None]))
+
+
+def scrub_logs_parallel(log_dfs, log_filenames, suppression, workers=None, normalization_cache=None,
+                        column_classifier=None):
+    """Yield (position, scrubbed_df, removed_df) for in-memory logs as workers finish them"""
+    with tempfile.TemporaryDirectory() as work_dir, _pool(suppression, work_dir, workers, normalization_cache,
+                                                          column_classifier) as pool:
+        futures = {
+            pool.submit(_scrub_frame, log_df, filename): i
+            for i, (log_df, filename) in enumerate(zip(log_dfs, log_filenames))
+        }
+        try:
+            for future in as_completed(futures):
+                result, stats = future.result()
+                _add_stats(normalization_cache, stats)
+                yield (futures[future], *result)
+        finally:
+            # Don't start queued files once the consumer stops early
+            for future in futures:
+                future.cancel()
+
+
+def merge_row_ranges(path, part_dirs, results, suppression, scrubbed_path, removed_path, log_name,
+                      column_classifier=None):
+    """Join the part files of a split log into its scrubbed and removed-records files"""
+    rows = sum(result[0] for result in results)
+    removed = sum(result[1] for result in results)
+    columns = next((result[2] for result in results if result[2] is not None), None)
+
+    if columns is None:
+        # A log with a header but no rows yields no chunks
+        scrubbed_df, _ = scrub_log(read_log(path), suppression, log_name, column_classifier=column_classifier)
+        scrubbed_df.to_csv(scrubbed_path, index=False)
+    else:
+        with open(scrubbed_path, 'wb') as out:
+            for part_dir in part_dirs:
+                part_path = os.path.join(part_dir, 'scrubbed.csv')
+                if os.path.exists(part_path):
+                    with open(part_path, 'rb') as part:
+                        shutil.copyfileobj(part, out)
+
+    if removed:
+        write_removed_records(removed_path, columns, [result[3] for result in results])
+    return rows, removed
+
+
+def scrub_log_files_parallel(log_files, output_paths, suppression, workers=None, chunksize=None,
+                             split_rows=None, log_names=None, engine="auto", normalization_cache=None,
+                             column_classifier=None):
+    """Yield (position, rows, removed) for log files as workers finish them
+
+    ``output_paths`` holds a (scrubbed_path, removed_path) pair per log.
+    Logs with more than ``split_rows`` rows are scrubbed as row ranges on
+    several workers and merged back in row order, so every output matches
+    what ``scrub_log_file`` would write.
+    """
+    log_names = log_names or [os.path.basename(path) for path in log_files]
+    with tempfile.TemporaryDirectory() as work_dir, _pool(suppression, work_dir, workers, normalization_cache,
+                                                          column_classifier) as pool:
+        futures = {}
+        part_dirs = {}
+        for i, (path, (scrubbed_path, removed_path)) in enumerate(zip(log_files, output_paths)):
+            ranges = plan_row_ranges(path, split_rows)
+            if len(ranges) == 1:
+                future = pool.submit(_scrub_file, path, scrubbed_path, removed_path, chunksize, log_names[i], engine)
+                futures[future] = (i, None)
+                continue
+            part_dirs[i] = [os.path.join(work_dir, f"{i}-{part}") for part in range(len(ranges))]
+            for part, (start, end) in enumerate(ranges):
+                future = pool.submit(_scrub_rows, path, start, end, part_dirs[i][part], chunksize, log_names[i])
+                futures[future] = (i, part)
+
+        part_results = {i: {} for i in part_dirs}
+        try:
+            for future in as_completed(futures):
+                i, part = futures[future]
+                result, stats = future.result()
+                _add_stats(normalization_cache, stats)
+                if part is None:
+                    yield (i, *result)
+                    continue
+                part_results[i][part] = result
+                if len(part_results[i]) == len(part_dirs[i]):
+                    results = [part_results[i][part] for part in range(len(part_dirs[i]))]
+                    scrubbed_path, removed_path = output_paths[i]
+                    yield (i, *merge_row_ranges(
+                        log_files[i], part_dirs[i], results, suppression, scrubbed_path, removed_path,
+                        log_names[i], column_classifier
+                    ))
+        finally:
+            # Don't start queued files once the consumer stops early
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,535 @@
+"""Headless scrub pipeline shared by the GUI and the command line
+
+Progress is reported through a ``progress(message, percent=None)`` callback,
+the same signature as ``LogProcessorApp.update_status``. It is called between
+files, columns and chunks, so raising Cancelled from it stops work cleanly.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import closing, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+from .columns import PhoneColumnClassifier, find_phone_columns
+from .conditions import DATE_COLUMN, count_occurrences, list_columns, select_numbers
+from .formats import check_format, convert_csv, output_name, write_frame
+from .ingest import read_list, read_log
+from .instrument import RunReport, scaled_progress
+from .normalize import NormalizationCache, group_keys, normalize_phone_column
+from .scrub import removed_record_groups
+from .suppression import SuppressionIndex, list_signature
+
+
+class Cancelled(Exception):
+    """Raised from a progress callback to stop the pipeline at the next step"""
+
+
+def no_progress(message, percent=None):
+    """Progress callback that discards everything"""
+
+
+def clean_df(df):
+    """Replace all NaN values with empty strings"""
+    return df.fillna('').replace(['nan', 'NaN', 'NaT'], '')
+
+
+def prepare_log_frame(log_df):
+    """Copy of a log with stripped, lowercase headers and NaN as empty strings"""
+    processed_log_df = log_df.copy()
+    processed_log_df.columns = processed_log_df.columns.str.strip().str.lower()
+    return clean_df(processed_log_df)
+
+
+def classify_log(column_classifier, log_df, log_name='', progress=no_progress):
+    """Decide a log's phone columns from its first rows
+
+    Done before a log is scrubbed in chunks or on workers, so every chunk
+    and worker sees the same decision.
+    """
+    return column_classifier.classify(prepare_log_frame(log_df.head(column_classifier.sample_window)),
+                                      log_name, progress)
+
+
+def prepare_list(list_df, conditions, progress=no_progress, report=None, normalization_cache=None):
+    """Normalize the list file and index the numbers matching the conditions
+
+    Returns the cleaned list with an ``occurrence`` column and the
+    SuppressionIndex of numbers to remove from the logs. Stages are timed
+    into ``report`` when given; phone numbers go through
+    ``normalization_cache`` (a ``normalize.NormalizationCache``) when given.
+    The list keeps its normalized numbers as text for the updated list,
+    while occurrences and conditions are worked out on their int64 keys.
+    """
+    report = report if report is not None else RunReport()
+    list_df = clean_df(list_df)
+
+    # Normalize list file phone numbers
+    with report.stage("normalize", rows=len(list_df)):
+        phones = normalize_phone_column(list_df["Phone"], normalization_cache)
+        list_df["Phone"] = phones.digits
+        keys, overflow = group_keys(phones.keys, phones.digits)
+        del phones
+    progress("Normalized phone numbers in list file")
+
+    # Compute occurrences
+    with report.stage("occurrences", rows=len(list_df)):
+        numbers_df = pd.DataFrame({"Log Type": list_df["Log Type"].to_numpy(), "Phone": keys})
+        if DATE_COLUMN in list_df:
+            numbers_df[DATE_COLUMN] = list_df[DATE_COLUMN].to_numpy()
+        list_occurrences, list_df["occurrence"] = count_occurrences(numbers_df)
+    progress("Computed phone number occurrences")
+
+    with report.stage("conditions", rows=len(list_occurrences)):
+        suppression = apply_conditions(list_occurrences, conditions, numbers_df, progress, overflow)
+    return list_df, suppression
+
+
+def apply_conditions(occurrences, conditions, list_df=None, progress=no_progress, overflow=()):
+    """SuppressionIndex of the numbers matching the conditions (see ``conditions.select_numbers``)
+
+    Numbers in ``occurrences`` and ``list_df`` are keys from
+    ``normalize.group_keys``, with ``overflow`` the numbers behind its
+    negative ids.
+    """
+    progress("Applying conditions...")
+    matches = select_numbers(occurrences, conditions, list_df)
+    for label, matching_numbers in matches:
+        progress(f"Found {len(matching_numbers)} numbers matching condition: {label}")
+    return SuppressionIndex.from_matches(matches, overflow)
+
+
+def scrub_chunk(log_df, suppression, filename='', progress=no_progress, normalization_cache=None,
+                column_classifier=None):
+    """Blank suppressed numbers in a log DataFrame
+
+    Returns the scrubbed DataFrame and a list of (column, removed rows)
+    pairs grouped by the first phone column that matched. Phone columns
+    are picked by ``column_classifier`` (a ``columns.PhoneColumnClassifier``)
+    when given, otherwise by header alone.
+    """
+    processed_log_df = prepare_log_frame(log_df)
+
+    if column_classifier is not None:
+        phone_columns = column_classifier.select(processed_log_df, filename, progress)
+    else:
+        phone_columns = find_phone_columns(processed_log_df.columns)
+    if not phone_columns:
+        progress(f"No phone columns found in {filename}")
+        return processed_log_df, []
+
+    # Process phone columns, looking their int64 keys up in the suppression index
+    remove_masks = {}
+    for col in phone_columns:
+        progress(f"Processing column: {col}")
+        phones = normalize_phone_column(processed_log_df[col], normalization_cache)
+        processed_log_df[col] = phones.repaired
+        remove_masks[col] = pd.Series(suppression.contains_normalized(phones.keys, phones.digits),
+                                      index=processed_log_df.index)
+
+    # Store rows that had numbers removed before blanking them
+    removed_groups = [
+        (col, clean_df(rows))
+        for col, rows in removed_record_groups(processed_log_df, phone_columns, remove_masks)
+    ]
+
+    # Remove matching numbers
+    for col, remove_mask in remove_masks.items():
+        if remove_mask.any():
+            processed_log_df.loc[remove_mask, col] = ''
+            progress(f"Removed {remove_mask.sum()} numbers from {col}")
+
+    return clean_df(processed_log_df), removed_groups
+
+
+def scrub_log(log_df, suppression, filename='', progress=no_progress, normalization_cache=None,
+              column_classifier=None):
+    """Blank suppressed numbers in one log, returning (scrubbed_df, removed_records_df)"""
+    scrubbed_df, removed_groups = scrub_chunk(log_df, suppression, filename, progress, normalization_cache,
+                                              column_classifier)
+    if not removed_groups:
+        return scrubbed_df, pd.DataFrame()
+    return scrubbed_df, pd.concat([rows for _, rows in removed_groups], ignore_index=True)
+
+
+def scrub_log_file(path, suppression, scrubbed_path, removed_path, chunksize=None,
+                   log_name='', progress=no_progress, engine="auto", normalization_cache=None,
+                   column_classifier=None):
+    """Scrub a log CSV into a scrubbed CSV and, if anything matched, a removed-records CSV
+
+    With ``chunksize`` the log is read and written that many rows at a
+    time so memory stays bounded. Removed records are spooled per matching
+    column and assembled in the same order as the in-memory path, so both
+    produce identical files. Returns (rows scrubbed, records removed).
+    """
+    if not chunksize:
+        scrubbed_df, removed_df = scrub_log(read_log(path, engine=engine), suppression, log_name, progress,
+                                            normalization_cache, column_classifier)
+        scrubbed_df.to_csv(scrubbed_path, index=False)
+        if not removed_df.empty:
+            removed_df.to_csv(removed_path, index=False)
+        return len(scrubbed_df), len(removed_df)
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        with read_log(path, chunksize) as reader:
+            rows, removed, columns, spools = scrub_chunks(
+                reader, suppression, scrubbed_path, spool_dir, log_name=log_name, progress=progress,
+                normalization_cache=normalization_cache, column_classifier=column_classifier
+            )
+
+        if columns is None:
+            # A log with a header but no rows yields no chunks
+            scrubbed_df, _ = scrub_log(read_log(path), suppression, log_name, column_classifier=column_classifier)
+            scrubbed_df.to_csv(scrubbed_path, index=False)
+
+        if spools:
+            write_removed_records(removed_path, columns, [spools])
+    return rows, removed
+
+
+def scrub_chunks(chunks, suppression, scrubbed_path, spool_dir, header=True,
+                 log_name='', progress=no_progress, normalization_cache=None, column_classifier=None):
+    """Scrub log chunks in order, writing them to scrubbed_path
+
+    Removed records are appended, without a header, to one spool file per
+    matching column in ``spool_dir``. Returns (rows, removed, columns,
+    spools): ``columns`` is None when there were no chunks and ``spools``
+    maps phone columns to their spool files.
+    """
+    rows = removed = 0
+    columns = None
+    spools = {}
+    for chunk in chunks:
+        scrubbed_df, removed_groups = scrub_chunk(chunk, suppression, log_name,
+                                                  normalization_cache=normalization_cache,
+                                                  column_classifier=column_classifier)
+        scrubbed_df.to_csv(
+            scrubbed_path, mode='w' if columns is None else 'a',
+            header=header and columns is None, index=False
+        )
+        columns = scrubbed_df.columns
+        for col, records in removed_groups:
+            spool_path = spools.setdefault(col, os.path.join(spool_dir, f"{len(spools)}.csv"))
+            records.to_csv(spool_path, mode='a', header=False, index=False)
+            removed += len(records)
+        rows += len(scrubbed_df)
+        progress(f"Scrubbed {rows} rows of {log_name}, {removed} removed so far")
+    return rows, removed, columns, spools
+
+
+def write_removed_records(removed_path, columns, spool_parts):
+    """Assemble spooled removed records into one CSV
+
+    ``spool_parts`` holds the spools of consecutive row ranges in row
+    order; records are written grouped by phone column, then by row, the
+    same order as ``removed_record_groups``.
+    """
+    pd.DataFrame(columns=columns).to_csv(removed_path, index=False)
+    with open(removed_path, 'ab') as out:
+        for col in find_phone_columns(columns):
+            for spools in spool_parts:
+                if col in spools:
+                    with open(spools[col], 'rb') as spool:
+                        shutil.copyfileobj(spool, out)
+
+
+def scrub_logs_serially(log_dfs, log_filenames, suppression, progress=no_progress, normalization_cache=None,
+                        column_classifier=None):
+    """Yield (position, scrubbed_df, removed_df) for each log, one after another"""
+    total_logs = len(log_dfs)
+    for i, (log_df, filename) in enumerate(zip(log_dfs, log_filenames)):
+        progress(f"Processing log file {i + 1}/{total_logs}: {filename}")
+        yield (i, *scrub_log(log_df, suppression, filename, progress, normalization_cache, column_classifier))
+
+
+def scrub_logs(log_dfs, log_filenames, suppression, progress=no_progress, workers=None, report=None,
+               normalization_cache=None, column_classifier=None):
+    """Scrub in-memory logs, returning the scrubbed logs and their removed records in log order
+
+    With ``workers`` > 1 the logs are scrubbed on a process pool, each
+    worker with its own cache of ``normalization_cache``'s size that
+    reports its statistics back. Phone columns are decided up front with
+    ``column_classifier`` when given. Percentages follow the log rows
+    scrubbed so far.
+    """
+    report = report if report is not None else RunReport()
+    progress("Scrubbing log files...", 0)
+    total_logs = len(log_dfs)
+    log_rows = sum(len(log_df) for log_df in log_dfs)
+    if column_classifier is not None:
+        # Logs classified already, such as for their result cache keys, keep that decision
+        for log_df, filename in zip(log_dfs, log_filenames):
+            column_classifier.select(prepare_log_frame(log_df.head(column_classifier.sample_window)), filename,
+                                     progress)
+    if workers and workers > 1 and total_logs > 1:
+        from .parallel import scrub_logs_parallel
+        results = scrub_logs_parallel(log_dfs, log_filenames, suppression, workers, normalization_cache,
+                                      column_classifier)
+    else:
+        results = scrub_logs_serially(log_dfs, log_filenames, suppression, progress, normalization_cache,
+                                      column_classifier)
+
+    updated_log_dfs = [None] * total_logs
+    removed_log_records = [None] * total_logs
+    done_rows = 0
+    with report.stage("scrub", rows=log_rows, files=total_logs), closing(results):
+        for done, (i, scrubbed_df, removed_df) in enumerate(results, 1):
+            updated_log_dfs[i] = scrubbed_df
+            removed_log_records[i] = removed_df
+            report.file_done(log_filenames[i], len(scrubbed_df), len(removed_df))
+            done_rows += len(scrubbed_df)
+            progress(f"Finished {log_filenames[i]} ({done}/{total_logs})", done_rows / max(log_rows, 1) * 100)
+    return updated_log_dfs, removed_log_records
+
+
+def process_data(log_dfs, list_df, conditions, log_filenames, progress=no_progress, workers=None,
+                 report=None, column_classifier=None, normalization_cache=None):
+    """Process the data using conditions
+
+    Returns the updated list, the scrubbed logs and their removed records.
+    With ``workers`` > 1 the logs are scrubbed on a process pool; results
+    keep the order of ``log_dfs`` either way. Progress percentages follow
+    the list and log rows processed so far; stages are timed into
+    ``report`` when given. Phone columns are picked by
+    ``column_classifier``, by default a fresh PhoneColumnClassifier, and
+    normalized through ``normalization_cache``, by default a fresh
+    NormalizationCache.
+    """
+    report = report if report is not None else RunReport()
+    normalization_cache = normalization_cache if normalization_cache is not None else NormalizationCache()
+    column_classifier = column_classifier if column_classifier is not None else PhoneColumnClassifier()
+    try:
+        progress("Starting data processing...", 0)
+        log_rows = sum(len(log_df) for log_df in log_dfs)
+        list_share = len(list_df) / max(len(list_df) + log_rows, 1) * 100
+
+        list_df, suppression = prepare_list(list_df, conditions, progress, report, normalization_cache)
+        updated_log_dfs, removed_log_records = scrub_logs(
+            log_dfs, log_filenames, suppression, scaled_progress(progress, list_share, 100), workers, report,
+            normalization_cache, column_classifier
+        )
+        report_normalization(normalization_cache, progress, report)
+        report.counters["phone_columns"] = column_classifier.summary()
+
+        progress("Data processing completed!", 100)
+        return clean_df(list_df), updated_log_dfs, removed_log_records
+
+    except Cancelled:
+        raise
+    except Exception as e:
+        progress(f"Error processing data: {str(e)}")
+        raise
+
+
+def report_normalization(normalization_cache, progress=no_progress, report=None):
+    """Report how much normalization a run's NormalizationCache saved"""
+    progress(normalization_cache.describe())
+    if report is not None:
+        report.counters["normalization_cache"] = normalization_cache.stats()
+
+
+def updated_list_name(current_date):
+    return f"Updated_List_{current_date}.csv"
+
+
+def scrubbed_log_name(log_name, current_date):
+    return f"Scrubbed_{log_name}_{current_date}.csv"
+
+
+def removed_records_name(log_name, current_date):
+    return f"Removed_Records_{log_name}_{current_date}.csv"
+
+
+def load_suppression(list_file, conditions, index_cache, progress=no_progress):
+    """Reuse a saved suppression index for an unchanged list file and conditions
+
+    Returns (index or None, signature, path to save a fresh index to).
+    """
+    signature = list_signature(list_file, conditions)
+    index_path = os.path.join(index_cache, f"suppression_{signature[:16]}.npz")
+    suppression = SuppressionIndex.load(index_path, signature)
+    if suppression is not None:
+        progress(f"Loaded suppression index of {len(suppression)} numbers from cache")
+    return suppression, signature, index_path
+
+
+def scrub_log_files_serially(log_files, output_paths, suppression, chunksize=None,
+                             log_names=None, progress=no_progress, engine="auto", normalization_cache=None,
+                             column_classifier=None):
+    """Yield (position, rows, removed) for each log file, one after another"""
+    log_names = log_names or [os.path.basename(path) for path in log_files]
+    total_logs = len(log_files)
+    for i, (path, (scrubbed_path, removed_path)) in enumerate(zip(log_files, output_paths)):
+        progress(f"Processing log file {i + 1}/{total_logs}: {log_names[i]}")
+        yield (i, *scrub_log_file(path, suppression, scrubbed_path, removed_path, chunksize, log_names[i],
+                                  progress, engine, normalization_cache, column_classifier))
+
+
+def _with_cached(cached, pending, results):
+    """Yield cached (position, rows, removed) first, then fresh results mapped back to log positions"""
+    for i, (rows, removed) in cached.items():
+        yield i, rows, removed
+    if results is not None:
+        with closing(results):
+            for j, rows, removed in results:
+                yield pending[j], rows, removed
+
+
+def run(list_file, log_files, conditions, output_dir, progress=no_progress,
+        index_cache=None, write_list=True, chunksize=None, workers=None, split_rows=None, engine="auto",
+        occurrence_store=None, report=None, result_cache=None, output_format="csv", column_classifier=None,
+        audit=None, normalization_cache=None):
+    """Scrub log files against a list file and write the results to output_dir
+
+    Output names match the GUI's Drive uploads. ``output_format`` is one of
+    ``formats.FORMATS``; logs are scrubbed to CSV and then converted. ``chunksize`` streams each
+    log in row chunks instead of loading it whole. ``workers`` > 1 scrubs
+    logs on a process pool, splitting logs longer than ``split_rows`` rows
+    across workers. ``engine`` picks the CSV parser for whole-file reads
+    (see ``ingest.resolve_engine``). With ``index_cache`` the
+    suppression index is saved there and reused while the list file and
+    conditions are unchanged; combined with ``write_list=False`` the list
+    file is then not read at all. Without ``write_list`` only the list
+    columns the scrub needs are read. With ``occurrence_store`` (a SQLite
+    file, see ``occurrences.OccurrenceStore``) the suppression index comes
+    from stored counts that only need the newly appended list rows.
+    Stages are timed into ``report`` when given. Log row counts are only
+    known once a file is scrubbed, so progress follows file sizes. With a
+    ``result_cache`` (a ``result_cache.ResultCache``) logs scrubbed before
+    against the same suppression set are copied from it instead. Phone
+    columns are picked by ``column_classifier``, by default a fresh
+    ``columns.PhoneColumnClassifier``, from the first rows of each log.
+    With ``audit`` (a SQLite file, see ``audit.AuditLog``) the removed
+    numbers of every log are added to that audit index. Phone numbers go
+    through ``normalization_cache``, by default a fresh
+    ``normalize.NormalizationCache``.
+    Returns the paths written.
+    """
+    check_format(output_format)
+    report = report if report is not None else RunReport()
+    normalization_cache = normalization_cache if normalization_cache is not None else NormalizationCache()
+    column_classifier = column_classifier if column_classifier is not None else PhoneColumnClassifier()
+    current_date = datetime.now().strftime("%Y%m%d")
+    log_names = [os.path.basename(path) for path in log_files]
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    # Progress follows the bytes of the list and the logs done so far
+    file_sizes = [os.path.getsize(path) for path in log_files]
+    total_bytes = max(os.path.getsize(list_file) + sum(file_sizes), 1)
+    done_bytes = os.path.getsize(list_file)
+
+    suppression = signature = index_path = None
+    if index_cache:
+        suppression, signature, index_path = load_suppression(list_file, conditions, index_cache, progress)
+
+    if suppression is None and occurrence_store:
+        from .occurrences import OccurrenceStore
+        with OccurrenceStore(occurrence_store) as store:
+            with report.stage("occurrence store") as stage:
+                stage["rows"] = store.ingest(list_file, progress)
+            with report.stage("conditions"):
+                suppression = store.suppression(conditions, progress)
+        if index_cache:
+            suppression.signature = signature
+            suppression.save(index_path)
+
+    if suppression is None or write_list:
+        with report.stage("load", file=os.path.basename(list_file)) as stage:
+            list_df = read_list(list_file, None if write_list else list_columns(conditions), engine)
+            stage["rows"] = len(list_df)
+        updated_list_df, list_suppression = prepare_list(list_df, conditions, progress, report, normalization_cache)
+        if suppression is None:
+            suppression = list_suppression
+            if index_cache:
+                suppression.signature = signature
+                suppression.save(index_path)
+        if write_list:
+            list_path = os.path.join(output_dir, output_name(updated_list_name(current_date), output_format))
+            with report.stage("write list", rows=len(updated_list_df)):
+                write_frame(clean_df(updated_list_df), list_path, output_format)
+            written.append(list_path)
+    progress("Scrubbing log files...", done_bytes / total_bytes * 100)
+
+    output_paths = [
+        (os.path.join(output_dir, scrubbed_log_name(log_name, current_date)),
+         os.path.join(output_dir, removed_records_name(log_name, current_date)))
+        for log_name in log_names
+    ]
+    final_paths = [tuple(output_name(path, output_format) for path in paths) for paths in output_paths]
+    total_logs = len(log_files)
+    # Decide phone columns from the head of each log, so chunks and workers agree and cache keys hold them
+    phone_columns = [
+        classify_log(column_classifier, read_log(path, nrows=column_classifier.sample_window), log_name, progress)
+        for path, log_name in zip(log_files, log_names)
+    ]
+    keys = {}
+    cached = {}
+    if result_cache is not None:
+        with report.stage("result cache", files=total_logs) as stage:
+            for i, path in enumerate(log_files):
+                keys[i] = result_cache.key(path, suppression, output_format, column_classifier, phone_columns[i])
+                hit = result_cache.restore(keys[i], *final_paths[i])
+                if hit is not None:
+                    cached[i] = hit
+            stage["hits"] = len(cached)
+        if cached:
+            progress(f"Reused cached results for {len(cached)} of {total_logs} log files")
+
+    pending = [i for i in range(total_logs) if i not in cached]
+    results = None
+    if pending and workers and workers > 1:
+        from .parallel import scrub_log_files_parallel
+        results = scrub_log_files_parallel(
+            [log_files[i] for i in pending], [output_paths[i] for i in pending], suppression, workers,
+            chunksize, split_rows, [log_names[i] for i in pending], engine, normalization_cache, column_classifier
+        )
+    elif pending:
+        results = scrub_log_files_serially(
+            [log_files[i] for i in pending], [output_paths[i] for i in pending], suppression, chunksize,
+            [log_names[i] for i in pending], progress, engine, normalization_cache, column_classifier
+        )
+
+    audit_log = run_id = None
+    audit_context = nullcontext()
+    if audit:
+        from .audit import RECORD_CHUNK_ROWS, AuditLog
+        audit_context = audit_log = AuditLog(audit)
+        run_id = audit_log.start_run(list_file, conditions)
+
+    removed_counts = [0] * total_logs
+    results = _with_cached(cached, pending, results)
+    with report.stage("scrub", rows=0, files=total_logs) as stage, closing(results), audit_context:
+        for done, (i, rows, removed) in enumerate(results, 1):
+            removed_counts[i] = removed
+            stage["rows"] += rows
+            report.file_done(log_names[i], rows, removed, cached=i in cached)
+            if i not in cached:
+                scrubbed_path, removed_path = output_paths[i]
+                if output_format != "csv":
+                    with report.stage("convert", file=log_names[i], format=output_format):
+                        convert_csv(scrubbed_path, output_format)
+                        if removed:
+                            convert_csv(removed_path, output_format)
+                if result_cache is not None:
+                    scrubbed_path, removed_path = final_paths[i]
+                    result_cache.put(keys[i], scrubbed_path, removed_path if removed else None, rows, removed)
+            if audit_log is not None and removed:
+                with report.stage("audit", file=log_names[i]) as audit_stage:
+                    audit_stage["numbers"] = audit_log.record_output(
+                        run_id, log_names[i], final_paths[i][1], output_format, column_classifier, suppression,
+                        chunksize or RECORD_CHUNK_ROWS
+                    )
+            done_bytes += file_sizes[i]
+            progress(f"Finished {log_names[i]}: {removed} of {rows} rows had numbers removed ({done}/{total_logs})",
+                     done_bytes / total_bytes * 100)
+
+    report_normalization(normalization_cache, progress, report)
+    report.counters["phone_columns"] = column_classifier.summary()
+    for (scrubbed_path, removed_path), removed in zip(final_paths, removed_counts):
+        written.append(scrubbed_path)
+        if removed:
+            written.append(removed_path)
+
+    progress("Data processing completed!", 100)
+    return written
@@ -0,0 +1,159 @@
+"""Content-addressed cache of scrubbed outputs, bounded in size with LRU eviction
+
+An entry holds the scrubbed output and, if anything was removed, the
+removed-records output of one log file. Its key covers everything the
+output depends on: the log file's content, the set of suppressed numbers,
+the rules that pick and normalize phone columns, the columns they picked
+in this log and the output format. A
+re-run with an unchanged log and suppression set copies the cached files
+instead of scrubbing again.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from .columns import PHONE_HEADER_PHRASES
+from .suppression import file_digest
+
+# Bump whenever scrubbing can produce different output for the same inputs
+CACHE_VERSION = 5
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+_META = 'meta.json'
+_SCRUBBED = 'scrubbed'
+_REMOVED = 'removed'
+
+CachedResult = namedtuple("CachedResult", "scrubbed_path removed_path rows removed")
+
+
+def default_cache_dir():
+    """Per-user cache directory of the app's scrubbed outputs"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'LogProcessor', 'results')
+
+
+def column_rules(column_classifier=None):
+    """Description of how phone columns are picked and scrubbed, part of every key"""
+    rules = {"version": CACHE_VERSION, "phone_headers": list(PHONE_HEADER_PHRASES)}
+    if column_classifier is not None:
+        rules["sampling"] = column_classifier.rules()
+    return rules
+
+
+def _write_source(source, path):
+    """Write bytes or copy a file to path"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        with open(path, 'wb') as f:
+            f.write(source)
+    else:
+        shutil.copyfile(source, path)
+
+
+class ResultCache:
+    """Scrubbed outputs on disk keyed by (log content, suppression set, column rules, format)
+
+    Each entry is a directory named after its key. Using an entry touches
+    its metadata file, and once the cache grows past ``max_bytes`` the
+    entries used longest ago are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        # The limit may have been lowered since the last run
+        self.evict()
+
+    def key(self, log_file, suppression, output_format="csv", column_classifier=None, phone_columns=None):
+        """Cache key of a log file scrubbed against a SuppressionIndex and written in output_format
+
+        ``phone_columns`` are the columns picked for this log; sampling can
+        pick different ones for logs with the same headers.
+        """
+        parts = [file_digest(log_file).hexdigest(), suppression.fingerprint(), column_rules(column_classifier),
+                 output_format, phone_columns]
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """CachedResult of a key, or None on a miss"""
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, _META)) as f:
+                meta = json.load(f)
+            os.utime(os.path.join(entry, _META))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        removed_path = os.path.join(entry, _REMOVED) if meta["removed"] else None
+        return CachedResult(os.path.join(entry, _SCRUBBED), removed_path, meta["rows"], meta["removed"])
+
+    def restore(self, key, scrubbed_path, removed_path):
+        """Copy a cached entry to the output paths, returning (rows, removed) or None on a miss"""
+        cached = self.get(key)
+        if cached is None:
+            return None
+        try:
+            shutil.copyfile(cached.scrubbed_path, scrubbed_path)
+            if cached.removed_path:
+                shutil.copyfile(cached.removed_path, removed_path)
+        except OSError:
+            # Evicted by another process in the meantime
+            return None
+        return cached.rows, cached.removed
+
+    def put(self, key, scrubbed, removed, rows, removed_count):
+        """Store a result; scrubbed and removed are bytes or file paths (removed may be None)"""
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.directory)
+        try:
+            _write_source(scrubbed, os.path.join(staging, _SCRUBBED))
+            if removed is not None and removed_count:
+                _write_source(removed, os.path.join(staging, _REMOVED))
+            with open(os.path.join(staging, _META), 'w') as f:
+                json.dump({"rows": rows, "removed": removed_count, "created": time.time()}, f)
+            os.replace(staging, entry)
+        except OSError:
+            # A concurrent run stored the same key first, or the disk is full
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self.evict()
+
+    def _entries(self):
+        """(last used, size, path) of every entry"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                files = [os.path.join(path, file) for file in os.listdir(path)]
+                meta = os.path.join(path, _META)
+                last_used = os.path.getmtime(meta) if os.path.exists(meta) else 0
+                entries.append((last_used, sum(os.path.getsize(file) for file in files), path))
+            except OSError:
+                # Deleted by another process while listing
+                continue
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,31 @@
+"""Per-file scrubbing helpers that work on whole columns at once"""
+import numpy as np
+
+
+def removed_record_groups(df, phone_columns, remove_masks):
+    """Yield (column, rows) pairs of removed records grouped by matching column
+
+    ``remove_masks`` maps phone columns, in scan order, to boolean masks of
+    rows whose number is suppressed. Each affected row is reported once,
+    under the first column that matched: that column keeps its value from
+    ``df`` and every other phone column is emptied. ``df`` must not have
+    been blanked yet.
+    """
+    columns = [col for col in phone_columns if col in remove_masks]
+    if not columns:
+        return
+
+    hits = np.column_stack([remove_masks[col].to_numpy(dtype=bool) for col in columns])
+    rows = np.flatnonzero(hits.any(axis=1))
+    if not len(rows):
+        return
+
+    first_match = hits[rows].argmax(axis=1)
+    for position, col in enumerate(columns):
+        selected = rows[first_match == position]
+        if not len(selected):
+            continue
+        removed = df.iloc[selected].copy()
+        removed[phone_columns] = ''
+        removed[col] = df[col].to_numpy()[selected]
+        yield col, removed
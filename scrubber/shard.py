@@ -0,0 +1,408 @@
+"""Sharded runs: plan once, scrub shards on any number of nodes, merge the outputs
+
+    python -m scrubber.shard plan SHARED logs/*.csv -l list.csv -c SMS=2 --shard-rows 2000000
+    python -m scrubber.shard work SHARED        (on every node, once per core)
+    python -m scrubber.shard merge SHARED -o outputs --zip outputs.zip
+
+The planner builds the suppression index once and writes it, the updated
+list file and a manifest of shards into SHARED, a directory every node
+mounts. A shard is a log file or a row range of a large one. Workers claim
+shards with exclusive lock files, scrub each into a private directory and
+rename that into place when it is complete, so a shard is never seen half
+written and one scrubbed twice (see ``work --reclaim``) is harmless. The
+merge joins the shards of every log in row order into the same outputs,
+and ZIP, as ``python -m scrubber`` and the app. ``run`` does all three
+with local processes standing in for the nodes.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from contextlib import nullcontext
+from datetime import datetime
+
+from .cli import expand_log_paths, parse_condition, print_progress
+from .columns import PhoneColumnClassifier
+from .formats import FORMATS, check_format, convert_csv, output_name, write_frame
+from .ingest import read_list, read_log
+from .normalize import NormalizationCache
+from .output import OutputFile, write_zip
+from .parallel import merge_row_ranges, plan_row_ranges, scrub_row_range
+from .pipeline import (
+    classify_log, clean_df, no_progress, prepare_list, removed_records_name, scrubbed_log_name, updated_list_name
+)
+from .suppression import SuppressionIndex, list_signature
+
+MANIFEST_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+SUPPRESSION_FILE = 'suppression.npz'
+SHARDS_DIR = 'shards'
+RESULT_FILE = 'result.json'
+
+
+def _stored_path(path, shared_dir):
+    """Logs inside the shared directory are stored relative to it, since nodes may mount it elsewhere"""
+    path = os.path.abspath(path)
+    shared_dir = os.path.abspath(shared_dir)
+    try:
+        if os.path.commonpath([path, shared_dir]) == shared_dir:
+            return os.path.relpath(path, shared_dir)
+    except ValueError:
+        # On another drive
+        pass
+    return path
+
+
+def _write_json(data, path):
+    """Write JSON next to path first, so readers never see it half written"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def shard_dir(shared_dir, shard):
+    return os.path.join(shared_dir, SHARDS_DIR, str(shard["id"]))
+
+
+def shard_done(shared_dir, shard):
+    return os.path.exists(os.path.join(shard_dir(shared_dir, shard), RESULT_FILE))
+
+
+def plan(shared_dir, list_file, log_files, conditions, output_format="csv", shard_rows=None,
+         column_classifier=None, engine="auto", progress=no_progress):
+    """Build the suppression index and the shard manifest of a run in shared_dir
+
+    Logs longer than ``shard_rows`` rows are split into row ranges of that
+    many rows. Phone columns are decided here, by ``column_classifier``
+    (by default a fresh PhoneColumnClassifier), and every worker uses
+    those decisions. Returns the manifest.
+    """
+    check_format(output_format)
+    column_classifier = column_classifier if column_classifier is not None else PhoneColumnClassifier()
+    if os.path.exists(os.path.join(shared_dir, MANIFEST_FILE)):
+        raise ValueError(f"{shared_dir} already holds a planned run")
+    os.makedirs(os.path.join(shared_dir, SHARDS_DIR), exist_ok=True)
+    current_date = datetime.now().strftime("%Y%m%d")
+
+    progress("Loading list file...")
+    normalization_cache = NormalizationCache()
+    list_df, suppression = prepare_list(read_list(list_file, None, engine), conditions, progress,
+                                        normalization_cache=normalization_cache)
+    suppression.signature = list_signature(list_file, conditions)
+    suppression.save(os.path.join(shared_dir, SUPPRESSION_FILE))
+    list_name = output_name(updated_list_name(current_date), output_format)
+    write_frame(clean_df(list_df), os.path.join(shared_dir, list_name), output_format)
+    del list_df
+
+    logs = []
+    shards = []
+    for i, path in enumerate(log_files):
+        name = os.path.basename(path)
+        classify_log(column_classifier, read_log(path, nrows=column_classifier.sample_window), name, progress)
+        logs.append({"name": name, "path": _stored_path(path, shared_dir), "size": os.path.getsize(path)})
+        for start, end in plan_row_ranges(path, shard_rows):
+            shards.append({"id": len(shards), "log": i, "start": start, "end": end})
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "date": current_date,
+        "list_file": os.path.basename(list_file),
+        "list_output": list_name,
+        "conditions": conditions,
+        "signature": suppression.signature,
+        "output_format": output_format,
+        "columns": column_classifier.as_dict(),
+        "logs": logs,
+        "shards": shards,
+    }
+    # Written last: a manifest means the plan is complete
+    _write_json(manifest, os.path.join(shared_dir, MANIFEST_FILE))
+    progress(f"Planned {len(shards)} shards of {len(logs)} log files, suppressing {len(suppression)} numbers")
+    return manifest
+
+
+def load_plan(shared_dir):
+    """The manifest, suppression index and phone column classifier of a planned run"""
+    with open(os.path.join(shared_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{shared_dir} was planned by another version of the scrubber")
+    suppression = SuppressionIndex.load(os.path.join(shared_dir, SUPPRESSION_FILE), manifest["signature"])
+    if suppression is None:
+        raise ValueError(f"The suppression index in {shared_dir} is missing or doesn't match the manifest")
+    return manifest, suppression, PhoneColumnClassifier.from_dict(manifest["columns"])
+
+
+def _claim(shared_dir, shard, worker_id):
+    """Take a shard unless another worker has; claims are lock files created exclusively"""
+    claim_path = shard_dir(shared_dir, shard) + '.claim'
+    try:
+        fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(worker_id)
+    return True
+
+
+def scrub_shard(shared_dir, manifest, shard, suppression, column_classifier, chunksize=None,
+                normalization_cache=None, worker_id=''):
+    """Scrub one shard into its directory of shared_dir"""
+    log = manifest["logs"][shard["log"]]
+    path = os.path.join(shared_dir, log["path"])
+    if os.path.getsize(path) != log["size"]:
+        raise RuntimeError(f"{log['name']} changed since the run was planned")
+
+    work_dir = tempfile.mkdtemp(prefix=f".{shard['id']}-", dir=os.path.join(shared_dir, SHARDS_DIR))
+    try:
+        rows, removed, columns, spools = scrub_row_range(
+            path, shard["start"], shard["end"], work_dir, suppression, chunksize, log["name"],
+            normalization_cache, column_classifier
+        )
+        _write_json({
+            "rows": rows,
+            "removed": removed,
+            "columns": list(columns) if columns is not None else None,
+            "spools": {col: os.path.basename(spool) for col, spool in spools.items()},
+            "worker": worker_id,
+        }, os.path.join(work_dir, RESULT_FILE))
+        os.rename(work_dir, shard_dir(shared_dir, shard))
+    except OSError:
+        # Another worker finished the shard first; keep its result
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not shard_done(shared_dir, shard):
+            raise
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+
+def work(shared_dir, worker_id=None, chunksize=None, reclaim=False, progress=no_progress):
+    """Scrub the shards of a planned run no other worker has claimed, returning how many
+
+    With ``reclaim`` shards claimed by workers that haven't finished them,
+    e.g. because their node went down, are scrubbed as well.
+    """
+    manifest, suppression, column_classifier = load_plan(shared_dir)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    normalization_cache = NormalizationCache()
+    done = 0
+    for shard in manifest["shards"]:
+        if shard_done(shared_dir, shard):
+            continue
+        if not _claim(shared_dir, shard, worker_id) and not reclaim:
+            continue
+        log = manifest["logs"][shard["log"]]
+        progress(f"Scrubbing shard {shard['id']}: {log['name']} from byte {shard['start']}")
+        scrub_shard(shared_dir, manifest, shard, suppression, column_classifier, chunksize, normalization_cache,
+                    worker_id)
+        done += 1
+    progress(f"{worker_id} scrubbed {done} shards; {normalization_cache.describe()}")
+    return done
+
+
+def _shard_results(shared_dir, shards):
+    """merge_row_ranges' (rows, removed, columns, spools) of finished shards"""
+    results = []
+    for shard in shards:
+        with open(os.path.join(shard_dir(shared_dir, shard), RESULT_FILE), encoding='utf-8') as f:
+            result = json.load(f)
+        spools = {col: os.path.join(shard_dir(shared_dir, shard), name) for col, name in result["spools"].items()}
+        results.append((result["rows"], result["removed"], result["columns"], spools))
+    return results
+
+
+def merge(shared_dir, output_dir, zip_path=None, audit=None, progress=no_progress):
+    """Assemble the outputs of a run whose shards are all scrubbed, returning the paths written
+
+    Outputs have the names and content ``pipeline.run`` would write; with
+    ``zip_path`` they are also packed into a ZIP as the app does. With
+    ``audit`` (a SQLite file, see ``audit.AuditLog``) the removed numbers
+    are added to that audit index.
+    """
+    manifest, suppression, column_classifier = load_plan(shared_dir)
+    missing = [shard["id"] for shard in manifest["shards"] if not shard_done(shared_dir, shard)]
+    if missing:
+        raise RuntimeError(f"{len(missing)} of {len(manifest['shards'])} shards are not scrubbed yet: "
+                           f"{', '.join(map(str, missing[:10]))}{'...' if len(missing) > 10 else ''}")
+    output_format = manifest["output_format"]
+    current_date = manifest["date"]
+    os.makedirs(output_dir, exist_ok=True)
+
+    list_path = os.path.join(output_dir, manifest["list_output"])
+    shutil.copyfile(os.path.join(shared_dir, manifest["list_output"]), list_path)
+    outputs = [OutputFile(manifest["list_output"], "list", path=list_path)]
+
+    audit_log = run_id = None
+    audit_context = nullcontext()
+    if audit:
+        from .audit import AuditLog
+        audit_context = audit_log = AuditLog(audit)
+        run_id = audit_log.start_run(manifest["list_file"], manifest["conditions"])
+
+    total_logs = len(manifest["logs"])
+    with audit_context:
+        for i, log in enumerate(manifest["logs"]):
+            shards = sorted((shard for shard in manifest["shards"] if shard["log"] == i),
+                            key=lambda shard: shard["start"])
+            scrubbed_path = os.path.join(output_dir, scrubbed_log_name(log["name"], current_date))
+            removed_path = os.path.join(output_dir, removed_records_name(log["name"], current_date))
+            rows, removed = merge_row_ranges(
+                os.path.join(shared_dir, log["path"]), [shard_dir(shared_dir, shard) for shard in shards],
+                _shard_results(shared_dir, shards), suppression, scrubbed_path, removed_path, log["name"],
+                column_classifier
+            )
+            paths = [("scrubbed", scrubbed_path)] + ([("removed", removed_path)] if removed else [])
+            for kind, path in paths:
+                path = convert_csv(path, output_format)
+                outputs.append(OutputFile(os.path.basename(path), kind, path=path))
+            if audit_log is not None and removed:
+                audit_log.record_output(run_id, log["name"], outputs[-1].path, output_format, column_classifier,
+                                        suppression)
+            progress(f"Merged {log['name']}: {removed} of {rows} rows had numbers removed ({i + 1}/{total_logs})",
+                     (i + 1) / total_logs * 100)
+
+    written = [output.path for output in outputs]
+    if zip_path:
+        progress("Creating download package...")
+        write_zip(outputs, zip_path)
+        written.append(zip_path)
+    return written
+
+
+def run_local(list_file, log_files, conditions, output_dir, workers=2, shared_dir=None, zip_path=None,
+              output_format="csv", shard_rows=None, column_classifier=None, chunksize=None, audit=None,
+              progress=no_progress):
+    """Plan, scrub and merge a sharded run with local worker processes standing in for nodes
+
+    Without ``shared_dir`` the shards live in a temporary directory.
+    Returns the paths written.
+    """
+    shared_context = nullcontext(shared_dir) if shared_dir else tempfile.TemporaryDirectory(prefix='scrubber-shards-')
+    with shared_context as shared_dir:
+        plan(shared_dir, list_file, log_files, conditions, output_format, shard_rows, column_classifier,
+             progress=progress)
+        command = [sys.executable, '-m', 'scrubber.shard', 'work', shared_dir]
+        if chunksize:
+            command += ['--chunksize', str(chunksize)]
+        if progress is no_progress:
+            command.append('-q')
+        # Workers import this package the way this process did, from any working directory
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get('PYTHONPATH')])))
+        processes = [subprocess.Popen(command + ['--worker-id', f"local-{n}"], env=env) for n in range(workers)]
+        failed = sum(process.wait() != 0 for process in processes)
+        if failed:
+            raise RuntimeError(f"{failed} of {workers} workers failed")
+        return merge(shared_dir, output_dir, zip_path, audit, progress)
+
+
+def _add_plan_arguments(parser):
+    parser.add_argument("logs", nargs="+", help="log CSV files or glob patterns")
+    parser.add_argument("-l", "--list", required=True, dest="list_file", help="list CSV file")
+    parser.add_argument(
+        "-c", "--condition", required=True, action="append", type=parse_condition,
+        dest="conditions", metavar="TYPE=MIN_COUNT",
+        help="suppression condition, as for python -m scrubber (repeatable)",
+    )
+    parser.add_argument("--shard-rows", type=int, metavar="ROWS", help="split logs longer than ROWS rows into shards")
+    parser.add_argument("--format", choices=FORMATS, default="csv", dest="output_format", help="output format")
+    parser.add_argument(
+        "--column-sample", type=int, default=200, metavar="ROWS",
+        help="rows sampled per phone-like column, as for python -m scrubber (default: 200)",
+    )
+
+
+def _add_merge_arguments(parser):
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for the outputs")
+    parser.add_argument("--zip", metavar="PATH", dest="zip_path", help="also pack the outputs into this ZIP")
+    parser.add_argument(
+        "--audit", metavar="PATH",
+        help="SQLite audit index to add the removed numbers to (default: the app's audit index)",
+    )
+    parser.add_argument("--no-audit", action="store_true", help="don't record removed numbers")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m scrubber.shard",
+        description="Scrub log files as shards spread over several processes or machines sharing a directory.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = commands.add_parser("plan", help="build the suppression index and the shard manifest")
+    plan_parser.add_argument("shared_dir", help="directory shared by the planner, the workers and the merge")
+    _add_plan_arguments(plan_parser)
+
+    work_parser = commands.add_parser("work", help="scrub unclaimed shards until none are left")
+    work_parser.add_argument("shared_dir", help="directory of a planned run")
+    work_parser.add_argument("--worker-id", help="name in claims and results (default: host and process id)")
+    work_parser.add_argument("--chunksize", type=int, metavar="ROWS", help="stream each shard ROWS rows at a time")
+    work_parser.add_argument(
+        "--reclaim", action="store_true",
+        help="also scrub shards claimed by workers that haven't finished them",
+    )
+
+    merge_parser = commands.add_parser("merge", help="assemble the outputs once every shard is scrubbed")
+    merge_parser.add_argument("shared_dir", help="directory of a planned run")
+    _add_merge_arguments(merge_parser)
+
+    run_parser = commands.add_parser("run", help="plan, scrub on local worker processes and merge")
+    _add_plan_arguments(run_parser)
+    _add_merge_arguments(run_parser)
+    run_parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1,
+        help="worker processes (default: one per CPU)",
+    )
+    run_parser.add_argument("--shared-dir", help="keep the shards here instead of a temporary directory")
+    run_parser.add_argument("--chunksize", type=int, metavar="ROWS", help="stream each shard ROWS rows at a time")
+
+    for command_parser in (plan_parser, work_parser, merge_parser, run_parser):
+        command_parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    progress = no_progress if args.quiet else print_progress
+
+    log_files = []
+    if args.command in ("plan", "run"):
+        log_files = expand_log_paths(args.logs)
+        if not log_files:
+            parser.error("no log files matched")
+    audit = None
+    if args.command in ("merge", "run") and not args.no_audit:
+        from .audit import default_audit_path
+        audit = args.audit or default_audit_path()
+
+    written = []
+    try:
+        if args.command == "plan":
+            plan(args.shared_dir, args.list_file, log_files, args.conditions, args.output_format, args.shard_rows,
+                 PhoneColumnClassifier(args.column_sample), progress=progress)
+        elif args.command == "work":
+            work(args.shared_dir, args.worker_id, args.chunksize, args.reclaim, progress)
+        elif args.command == "merge":
+            written = merge(args.shared_dir, args.output_dir, args.zip_path, audit, progress)
+        else:
+            written = run_local(args.list_file, log_files, args.conditions, args.output_dir, args.workers,
+                                args.shared_dir, args.zip_path, args.output_format, args.shard_rows,
+                                PhoneColumnClassifier(args.column_sample), args.chunksize, audit, progress)
+    except Exception as e:
+        print(f"Sharded {args.command} failed: {str(e)}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        for path in written:
+            print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
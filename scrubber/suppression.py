@@ -0,0 +1,152 @@
+"""Suppression index: the set of normalized numbers that must be scrubbed"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .normalize import INVALID_KEY, phone_keys
+
+
+def file_digest(path, digest=None):
+    """Feed a file's content to a hashlib digest (sha256 by default) and return it"""
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest
+
+
+def list_signature(list_file, conditions):
+    """Fingerprint a list file's content together with the conditions applied to it"""
+    digest = file_digest(list_file)
+    digest.update(json.dumps(conditions, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SuppressionIndex:
+    """Sorted int64 array of normalized numbers with batched membership tests
+
+    Numbers that don't fit the int64 key encoding (more than 17 digits) are
+    kept in a small set of strings next to the array. Indexes built from
+    conditions also keep, in ``matches``, a (condition label, index) pair
+    per condition with the numbers it matched.
+    """
+
+    def __init__(self, keys=None, overflow=(), signature='', matches=()):
+        self.keys = np.unique(np.asarray(keys if keys is not None else [], dtype=np.int64))
+        self.overflow = frozenset(overflow)
+        self.signature = signature
+        self.matches = list(matches)
+
+    @classmethod
+    def from_sorted(cls, keys, overflow=(), signature=''):
+        """Wrap an already sorted, deduplicated key array (e.g. a memory map) without copying"""
+        index = cls.__new__(cls)
+        index.keys = keys
+        index.overflow = frozenset(overflow)
+        index.signature = signature
+        index.matches = []
+        return index
+
+    @classmethod
+    def from_group_keys(cls, keys, overflow=(), signature=''):
+        """Build an index from keys made by ``normalize.group_keys`` and its numbers without a key"""
+        keys = np.asarray(keys, dtype=np.int64)
+        valid = keys >= 0
+        overflow = np.asarray(overflow, dtype=object)
+        return cls(keys[valid], overflow[INVALID_KEY - 1 - keys[~valid]].astype(str), signature)
+
+    @classmethod
+    def from_matches(cls, matches, overflow=(), signature=''):
+        """Build an index from (condition label, group keys) pairs, remembering each condition's numbers"""
+        matches = [(label, cls.from_group_keys(keys, overflow)) for label, keys in matches]
+        keys = np.concatenate([index.keys for _, index in matches]) if matches else []
+        overflow = set().union(*(index.overflow for _, index in matches))
+        return cls(keys, overflow, signature, matches)
+
+    def __len__(self):
+        return len(self.keys) + len(self.overflow)
+
+    def __contains__(self, number):
+        return bool(self.contains(pd.Series([number], dtype=object)).iloc[0])
+
+    def contains_keys(self, keys):
+        """Boolean array telling which int64 keys are suppressed"""
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.searchsorted(self.keys, keys)
+        positions[positions == len(self.keys)] = 0
+        return (self.keys[positions] == keys) & (keys != INVALID_KEY)
+
+    def contains_normalized(self, keys, numbers):
+        """Boolean array telling which numbers, as keys and normalized text, are suppressed
+
+        The text is only read for numbers without a key.
+        """
+        found = self.contains_keys(keys)
+        invalid = np.asarray(keys) == INVALID_KEY
+        if self.overflow and invalid.any():
+            found[invalid] = pd.Series(np.asarray(numbers, dtype=object)[invalid]).astype(str).isin(self.overflow).to_numpy()
+        return found
+
+    def contains(self, numbers):
+        """Boolean Series telling which normalized numbers are suppressed"""
+        return pd.Series(self.contains_normalized(phone_keys(numbers), numbers), index=numbers.index)
+
+    def conditions_of(self, keys, numbers):
+        """Labels of the conditions that matched each number, joined by "; " ('' if none are known)"""
+        keys = np.asarray(keys, dtype=np.int64)
+        codes = np.zeros(len(keys), dtype=np.int64)
+        for bit, (_, index) in enumerate(self.matches):
+            codes |= index.contains_normalized(keys, numbers).astype(np.int64) << bit
+        # Join labels once per distinct combination of conditions
+        combinations, positions = np.unique(codes, return_inverse=True)
+        labels = np.array([
+            "; ".join(label for bit, (label, _) in enumerate(self.matches) if code >> bit & 1)
+            for code in combinations
+        ], dtype=object)
+        return labels[positions]
+
+    def fingerprint(self):
+        """sha256 of the suppressed numbers, equal for indexes holding the same set"""
+        digest = hashlib.sha256(np.ascontiguousarray(self.keys, dtype=np.int64).tobytes())
+        for number in sorted(self.overflow):
+            digest.update(b'\n' + number.encode('utf-8'))
+        return digest.hexdigest()
+
+    def save(self, path):
+        """Persist the index to an .npz file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        matches = {}
+        for i, (_, index) in enumerate(self.matches):
+            matches[f"match_keys_{i}"] = index.keys
+            matches[f"match_overflow_{i}"] = np.array(sorted(index.overflow), dtype=str)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                keys=self.keys,
+                overflow=np.array(sorted(self.overflow), dtype=str),
+                signature=np.array(self.signature),
+                match_labels=np.array([label for label, _ in self.matches], dtype=str),
+                **matches
+            )
+
+    @classmethod
+    def load(cls, path, signature=None):
+        """Load a saved index, or return None if missing, built from other inputs or saved without matches"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            saved_signature = str(data['signature'])
+            if (signature is not None and saved_signature != signature) or 'match_labels' not in data.files:
+                return None
+            matches = [
+                (label, cls(data[f"match_keys_{i}"], data[f"match_overflow_{i}"].tolist()))
+                for i, label in enumerate(data['match_labels'].tolist())
+            ]
+            return cls(data['keys'], data['overflow'].tolist(), saved_signature, matches)
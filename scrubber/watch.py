@@ -0,0 +1,396 @@
+"""Watch-folder daemon: scrub log CSVs as they land in an inbox
+
+    python -m scrubber.watch INBOX -l list.csv -c SMS=2 -o OUTBOX
+
+The suppression index is built once and kept in memory between files; it
+is rebuilt only when the list file's content changes. New ``*.csv`` files
+in the inbox are picked up from watchdog events (and a scan at startup),
+scrubbed once their size stops changing, and their outputs moved into the
+outbox. Outputs are assembled in a hidden ``.scrubbing-*`` directory of the
+outbox first, so files appear there complete. Scrubbed logs are moved to
+``INBOX/processed`` and logs that failed to ``INBOX/failed``. Names taken
+there or in the outbox, e.g. by a log of the same name scrubbed earlier
+that day, get a timestamp suffix instead of being replaced. With
+``--drive-credentials`` outputs are also uploaded over one Drive client
+that stays connected. Removed numbers are added to the audit index, one
+run per list file load.
+"""
+import argparse
+import os
+import queue
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .audit import RECORD_CHUNK_ROWS, AuditLog, default_audit_path
+from .cli import parse_condition
+from .columns import PhoneColumnClassifier
+from .conditions import list_columns
+from .formats import EXTENSIONS, FORMATS, check_format, convert_csv
+from .ingest import read_list, read_log
+from .normalize import NormalizationCache
+from .pipeline import (
+    classify_log, no_progress, prepare_list, removed_records_name, scrub_log_file, scrubbed_log_name
+)
+from .suppression import list_signature
+
+PROCESSED_DIR = 'processed'
+FAILED_DIR = 'failed'
+
+
+def wait_until_settled(path, settle, stop):
+    """Wait until path's size and mtime hold still for settle seconds
+
+    Files last written longer ago than that count as settled at once.
+    Returns False if the file disappears or ``stop`` (a threading.Event)
+    is set first.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if time.time() - stat.st_mtime >= settle:
+        return True
+    while not stop.wait(settle):
+        try:
+            current = os.stat(path)
+        except OSError:
+            return False
+        if (current.st_size, current.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return True
+        stat = current
+    return False
+
+
+def _with_suffix(name, suffix):
+    """name with suffix inserted before its extension, output formats' '.csv.zst' included"""
+    extensions = sorted(EXTENSIONS.values(), key=len, reverse=True)
+    ext = next((ext for ext in extensions if name.endswith(ext)), os.path.splitext(name)[1])
+    return name[:len(name) - len(ext)] + suffix + ext
+
+
+def unique_names(directory, names):
+    """names, or all of them with one timestamp added if any would replace a file in directory"""
+    if not any(os.path.exists(os.path.join(directory, name)) for name in names):
+        return names
+    suffix = f"_{datetime.now():%Y%m%d%H%M%S%f}"
+    return [_with_suffix(name, suffix) for name in names]
+
+
+class _InboxHandler(FileSystemEventHandler):
+    def __init__(self, daemon):
+        self.daemon = daemon
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.daemon.submit(event.src_path)
+
+    def on_modified(self, event):
+        # Copies that create the file before writing it only show up here
+        if not event.is_directory:
+            self.daemon.submit(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.daemon.submit(event.dest_path)
+
+
+class WatchDaemon:
+    """Scrub log files landing in inbox against a warm suppression index
+
+    ``uploader`` (a DriveUploader) and ``folders`` (Drive folder ids by
+    output kind, "scrubbed" and "removed") enable uploads. Phone column
+    decisions of ``column_classifier`` are kept for the daemon's lifetime,
+    so each log layout is sampled once. With ``audit`` (a SQLite file, see
+    ``audit.AuditLog``) removed numbers are added to that audit index.
+    ``normalization_cache`` likewise lasts as long as the daemon.
+    """
+
+    def __init__(self, inbox, list_file, conditions, outbox, progress=no_progress, settle=1.0,
+                 chunksize=None, engine="auto", output_format="csv", uploader=None, folders=None,
+                 column_classifier=None, audit=None, normalization_cache=None):
+        check_format(output_format)
+        self.inbox = os.path.abspath(inbox)
+        self.list_file = os.path.abspath(list_file)
+        self.conditions = conditions
+        self.outbox = os.path.abspath(outbox)
+        self.progress = progress
+        self.settle = settle
+        self.chunksize = chunksize
+        self.engine = engine
+        self.output_format = output_format
+        self.uploader = uploader
+        self.folders = folders or {}
+        self.normalization_cache = normalization_cache if normalization_cache is not None else NormalizationCache()
+        self.column_classifier = column_classifier if column_classifier is not None else PhoneColumnClassifier()
+        self.audit = audit
+        self.processed = 0
+        self.failed = 0
+        self._suppression = None
+        self._list_stat = None
+        self._audit_run = None
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        os.makedirs(self.outbox, exist_ok=True)
+
+    def stop(self):
+        """Stop after the current file; safe to call from a signal handler or another thread"""
+        self._stop.set()
+
+    def submit(self, path):
+        """Queue a log file of the inbox unless it is queued already or isn't a log"""
+        path = os.path.abspath(path)
+        name = os.path.basename(path)
+        if (os.path.dirname(path) != self.inbox or not name.lower().endswith('.csv')
+                or name.startswith(('.', '~$')) or path == self.list_file):
+            return
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+        self._queue.put(path)
+
+    def scan(self):
+        """Queue the log files already in the inbox, oldest first"""
+        logs = []
+        for name in os.listdir(self.inbox):
+            path = os.path.join(self.inbox, name)
+            try:
+                if os.path.isfile(path):
+                    logs.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                # Moved away since it was listed
+                continue
+        for _, path in sorted(logs):
+            self.submit(path)
+
+    def suppression(self):
+        """Suppression index of the list file, rebuilt only when its content changed"""
+        stat = os.stat(self.list_file)
+        if self._suppression is not None and (stat.st_size, stat.st_mtime_ns) == self._list_stat:
+            return self._suppression
+        if not wait_until_settled(self.list_file, self.settle, self._stop) and self._suppression is not None:
+            return self._suppression
+
+        try:
+            stat = os.stat(self.list_file)
+            signature = list_signature(self.list_file, self.conditions)
+            if self._suppression is None or signature != self._suppression.signature:
+                self.progress("Loading list file...")
+                list_df = read_list(self.list_file, list_columns(self.conditions), self.engine)
+                _, suppression = prepare_list(list_df, self.conditions, self.progress,
+                                              normalization_cache=self.normalization_cache)
+                suppression.signature = signature
+                self._suppression = suppression
+                self._audit_run = None
+                self.progress(f"Suppressing {len(suppression)} numbers from {os.path.basename(self.list_file)}")
+        except Exception as e:
+            if self._suppression is None:
+                raise
+            self.progress(f"Could not reload the list file, keeping the previous one: {str(e)}")
+            return self._suppression
+        self._list_stat = (stat.st_size, stat.st_mtime_ns)
+        return self._suppression
+
+    def _move_input(self, path, folder):
+        """Move a handled log out of the inbox, keeping earlier logs of the same name"""
+        target_dir = os.path.join(self.inbox, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        name, = unique_names(target_dir, [os.path.basename(path)])
+        os.replace(path, os.path.join(target_dir, name))
+
+    def _upload(self, outputs):
+        """Queue outputs, as (kind, path) pairs, for upload and report each when it finishes"""
+        from .drive import UploadJob, describe_result, result_of
+
+        jobs = [UploadJob(os.path.basename(path), path, self.folders[kind]) for kind, path in outputs
+                if self.folders.get(kind)]
+        for job, future in self.uploader.submit_all(jobs):
+            future.add_done_callback(lambda future, job=job: self.progress(describe_result(result_of(job, future))))
+
+    def _record_audit(self, name, removed_path, suppression):
+        """Add a log's removed records to the audit run of the current list file"""
+        try:
+            with AuditLog(self.audit) as audit_log:
+                if self._audit_run is None:
+                    self._audit_run = audit_log.start_run(self.list_file, self.conditions)
+                audit_log.record_output(self._audit_run, name, removed_path, "csv", self.column_classifier,
+                                        suppression, self.chunksize or RECORD_CHUNK_ROWS)
+        except sqlite3.Error as e:
+            # The log is scrubbed either way
+            self.progress(f"Audit index not updated for {name}: {str(e)}")
+
+    def process(self, path):
+        """Scrub one inbox log into the outbox; returns the output paths, or None if it was skipped or failed"""
+        with self._lock:
+            self._queued.discard(path)
+        if not wait_until_settled(path, self.settle, self._stop):
+            return None
+        name = os.path.basename(path)
+        current_date = datetime.now().strftime("%Y%m%d")
+        try:
+            suppression = self.suppression()
+            self.progress(f"Scrubbing {name}...")
+            head = read_log(path, nrows=self.column_classifier.sample_window)
+            classify_log(self.column_classifier, head, name, self.progress)
+            with tempfile.TemporaryDirectory(prefix='.scrubbing-', dir=self.outbox) as work_dir:
+                scrubbed_path = os.path.join(work_dir, scrubbed_log_name(name, current_date))
+                removed_path = os.path.join(work_dir, removed_records_name(name, current_date))
+                rows, removed = scrub_log_file(path, suppression, scrubbed_path, removed_path, self.chunksize,
+                                               name, self.progress, self.engine, self.normalization_cache,
+                                               self.column_classifier)
+                if removed and self.audit:
+                    self._record_audit(name, removed_path, suppression)
+                outputs = [("scrubbed", scrubbed_path)] + ([("removed", removed_path)] if removed else [])
+                outputs = [(kind, convert_csv(output, self.output_format)) for kind, output in outputs]
+                # A log of the same name scrubbed earlier today keeps its outputs
+                names = unique_names(self.outbox, [os.path.basename(output) for _, output in outputs])
+                written = []
+                for (kind, output), target_name in zip(outputs, names):
+                    target = os.path.join(self.outbox, target_name)
+                    os.replace(output, target)
+                    written.append((kind, target))
+            self._move_input(path, PROCESSED_DIR)
+        except Exception as e:
+            self.failed += 1
+            self.progress(f"Failed to scrub {name}: {str(e)}")
+            if os.path.exists(path):
+                self._move_input(path, FAILED_DIR)
+            return None
+
+        self.processed += 1
+        self.progress(f"Finished {name}: {removed} of {rows} rows had numbers removed")
+        if self.uploader is not None:
+            self._upload(written)
+        return [target for _, target in written]
+
+    def run(self, once=False):
+        """Watch the inbox until stop(); with once, scrub the logs already there and return"""
+        self.suppression()
+        if once:
+            self.scan()
+            while not self._queue.empty() and not self._stop.is_set():
+                self.process(self._queue.get())
+            return
+
+        observer = Observer()
+        observer.schedule(_InboxHandler(self), self.inbox, recursive=False)
+        observer.start()
+        self.progress(f"Watching {self.inbox} for log files")
+        try:
+            # Scan after the observer starts so files landing in between aren't missed
+            self.scan()
+            while not self._stop.is_set():
+                try:
+                    path = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self.process(path)
+        finally:
+            observer.stop()
+            observer.join()
+
+
+def timestamped_progress(message, percent=None):
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}", file=sys.stderr, flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m scrubber.watch",
+        description="Scrub log CSVs dropped into an inbox directory as they arrive.",
+    )
+    parser.add_argument("inbox", help="directory to watch for log CSVs")
+    parser.add_argument("-l", "--list", required=True, dest="list_file", help="list CSV file")
+    parser.add_argument(
+        "-c", "--condition", required=True, action="append", type=parse_condition,
+        dest="conditions", metavar="TYPE=MIN_COUNT",
+        help="suppression condition, as for python -m scrubber (repeatable)",
+    )
+    parser.add_argument("-o", "--outbox", required=True, help="directory the outputs are moved to")
+    parser.add_argument(
+        "--settle", type=float, default=1.0, metavar="SECONDS",
+        help="wait until a file's size has not changed for this long before reading it (default: 1)",
+    )
+    parser.add_argument("--chunksize", type=int, metavar="ROWS", help="stream each log ROWS rows at a time")
+    parser.add_argument("--engine", choices=("auto", "c", "pyarrow"), default="auto", help="CSV parser")
+    parser.add_argument("--format", choices=FORMATS, default="csv", dest="output_format", help="output format")
+    parser.add_argument(
+        "--column-sample", type=int, default=200, metavar="ROWS",
+        help="rows sampled per phone-like column, as for python -m scrubber (default: 200)",
+    )
+    parser.add_argument(
+        "--normalization-cache", type=int, default=250000, metavar="ENTRIES",
+        help="phone numbers kept normalized across logs, as for python -m scrubber (default: 250000)",
+    )
+    parser.add_argument(
+        "--audit", metavar="PATH",
+        help="SQLite audit index to add the removed numbers to (default: the app's audit index)",
+    )
+    parser.add_argument("--no-audit", action="store_true", help="don't record removed numbers")
+    parser.add_argument("--drive-credentials", metavar="PATH", help="service account JSON to upload outputs with")
+    parser.add_argument("--scrubbed-folder", metavar="ID", help="Drive folder for scrubbed logs")
+    parser.add_argument("--removed-folder", metavar="ID", help="Drive folder for removed records")
+    parser.add_argument("--once", action="store_true", help="scrub the logs in the inbox now and exit")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.inbox):
+        parser.error(f"inbox {args.inbox!r} is not a directory")
+    if args.drive_credentials and not (args.scrubbed_folder or args.removed_folder):
+        parser.error("--drive-credentials needs --scrubbed-folder and/or --removed-folder")
+
+    uploader = None
+    if args.drive_credentials:
+        from google.oauth2.service_account import Credentials
+
+        from .drive import DriveUploader, build_drive_service
+
+        credentials = Credentials.from_service_account_file(
+            args.drive_credentials, scopes=['https://www.googleapis.com/auth/drive.file']
+        )
+        uploader = DriveUploader(build_drive_service(credentials), credentials)
+
+    daemon = WatchDaemon(
+        args.inbox, args.list_file, args.conditions, args.outbox,
+        progress=timestamped_progress,
+        settle=args.settle,
+        chunksize=args.chunksize,
+        engine=args.engine,
+        output_format=args.output_format,
+        uploader=uploader,
+        folders={"scrubbed": args.scrubbed_folder, "removed": args.removed_folder},
+        column_classifier=PhoneColumnClassifier(args.column_sample),
+        audit=None if args.no_audit else args.audit or default_audit_path(),
+        normalization_cache=NormalizationCache(args.normalization_cache),
+    )
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Watching failed: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        if uploader is not None:
+            # Let queued uploads finish
+            uploader.close()
+    timestamped_progress(f"Stopped after {daemon.processed} log files ({daemon.failed} failed)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Local stand-in for the Drive v3 upload endpoint
+
+Point ``build_drive_service(api_endpoint=server.url)`` at a running
+FakeDriveServer to exercise DriveUploader without network access. It
+understands multipart and resumable uploads, including status queries of
+an interrupted one. It can answer the first requests with an error status
+to exercise retries, drop the connection in the middle of resumable
+chunks, and reject files by name.
+"""
+import email.parser
+import email.policy
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeDriveServer:
+    """Threaded HTTP server that stores uploaded files in memory"""
+
+    def __init__(self, fail_first=0, fail_status=503, drop_chunks=0, reject=()):
+        self.files = {}
+        self.requests = 0
+        self.status_queries = 0
+        self.dropped = 0
+        self._failures_left = fail_first
+        self._fail_status = fail_status
+        self._drops_left = drop_chunks
+        self._reject = set(reject)
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def by_name(self, name):
+        """Stored file record for an uploaded name"""
+        return next(record for record in self.files.values() if record['name'] == name)
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self._failures_left > 0:
+                self._failures_left -= 1
+                return True
+            return False
+
+    def _drop(self, session, body):
+        """Whether to cut off a chunk after the first, keeping half of the first one cut off"""
+        with self._lock:
+            if self._drops_left <= 0 or not session['content']:
+                return False
+            if not self.dropped:
+                session['content'] += body[:len(body) // 2]
+            self._drops_left -= 1
+            self.dropped += 1
+            return True
+
+    def _store(self, metadata, content):
+        with self._lock:
+            file_id = f"fake-{next(self._ids)}"
+            self.files[file_id] = dict(metadata, id=file_id, content=content)
+        return file_id
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # httplib2 resends a cut-off chunk once on a new connection, but
+            # from its already consumed stream; time that request out
+            timeout = 1
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def _fail(self):
+                code = server._fail_status
+                self._reply(code, {'error': {'code': code, 'message': 'try again'}})
+
+            def _reject(self, metadata):
+                if metadata.get('name') not in server._reject:
+                    return False
+                self._reply(403, {'error': {'code': 403, 'message': 'not allowed'}})
+                return True
+
+            def _reply(self, code, payload=None, headers=()):
+                body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self._body()
+                if server._should_fail():
+                    return self._fail()
+                query = parse_qs(urlparse(self.path).query)
+                upload_type = query.get('uploadType', [''])[0]
+                if upload_type == 'resumable':
+                    session = f"s{next(server._ids)}"
+                    metadata = dict(json.loads(body or b'{}'), mimeType=self.headers.get('X-Upload-Content-Type'))
+                    if self._reject(metadata):
+                        return
+                    server._sessions[session] = {'metadata': metadata, 'content': b''}
+                    location = f"{server.url}upload/drive/v3/files?uploadType=resumable&upload_id={session}"
+                    return self._reply(200, headers=[('Location', location)])
+                if upload_type == 'multipart':
+                    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + body
+                    )
+                    metadata_part, media_part = message.iter_parts()
+                    metadata = dict(json.loads(metadata_part.get_payload(decode=True)),
+                                    mimeType=media_part.get_content_type())
+                    if self._reject(metadata):
+                        return
+                    file_id = server._store(metadata, media_part.get_payload(decode=True))
+                    return self._reply(200, {'id': file_id})
+                self._reply(400, {'error': {'code': 400, 'message': 'unsupported uploadType'}})
+
+            def do_PUT(self):
+                body = self._body()
+                if server._should_fail():
+                    return self._fail()
+                session_id = parse_qs(urlparse(self.path).query).get('upload_id', [''])[0]
+                session = server._sessions.get(session_id)
+                content_range = self.headers.get('Content-Range', '')
+                if session is not None and re.fullmatch(r'bytes \*/(\d+|\*)', content_range):
+                    # Status query: how much of the upload arrived
+                    server.status_queries += 1
+                    received = len(session['content'])
+                    return self._reply(308, headers=[('Range', f"bytes=0-{received - 1}")] if received else [])
+                match = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', content_range)
+                if session is None or match is None:
+                    return self._reply(404, {'error': {'code': 404, 'message': 'no such upload'}})
+                start, end, total = match.groups()
+                if int(start) > len(session['content']):
+                    return self._reply(400, {'error': {'code': 400, 'message': 'wrong offset'}})
+                # Bytes that already arrived are ignored when sent again
+                body = body[len(session['content']) - int(start):]
+                if server._drop(session, body):
+                    # Close without answering, as if the connection broke
+                    self.close_connection = True
+                    return
+                session['content'] += body
+                if total != '*' and int(end) + 1 == int(total):
+                    del server._sessions[session_id]
+                    return self._reply(200, {'id': server._store(session['metadata'], session['content'])})
+                self._reply(308, headers=[('Range', f"bytes=0-{end}")])
+
+        return Handler
@@ -0,0 +1,34 @@
+from scrubber.audit import AuditLog
+from scrubber.pipeline import run
+
+LIST = """Log Type,Phone
+SMS,5551234567
+SMS,5551234567
+Call,5559876543
+Call,5559876543
+"""
+
+LOG = """name,phone,mobile
+a,5551234567,
+b,(555) 987-6543,5551234567
+c,5550000000,5559876543
+d,15551234567,
+"""
+
+
+def test_recorded_run_can_be_looked_up(tmp_path):
+    (tmp_path / "list.csv").write_text(LIST)
+    (tmp_path / "log.csv").write_text(LOG)
+    audit = str(tmp_path / "audit.sqlite")
+    conditions = [{"type": "SMS", "threshold": 2}, {"type": "Call", "threshold": 2}]
+    # Two-row chunks: the removed records are recorded a chunk at a time
+    run(str(tmp_path / "list.csv"), [str(tmp_path / "log.csv")], conditions, str(tmp_path / "out"),
+        write_list=False, chunksize=2, audit=audit)
+
+    with AuditLog(audit) as audit_log:
+        entries = audit_log.lookup(["555-123-4567", "5559876543", "5550000000"])
+    found = {(entry["phone"], entry["log"], entry["column"], entry["rows"]) for entry in entries}
+    # A record counts under the first phone column holding a suppressed number
+    assert found == {("5551234567", "log.csv", "phone", 2), ("5559876543", "log.csv", "phone", 1),
+                     ("5559876543", "log.csv", "mobile", 1)}
+    assert all(entry["list_file"] == "list.csv" for entry in entries)
@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+
+from scrubber.columns import PhoneColumnClassifier
+from scrubber.pipeline import run
+
+LIST = """Log Type,Phone
+SMS,5551234567
+SMS,5551234567
+"""
+
+
+def log_frame(ids):
+    return pd.DataFrame({"name": [f"r{i}" for i in range(len(ids))], "graph_id": ids, "ph_id": ids,
+                         "phone": [f"555000{i:04d}" for i in range(len(ids))]}, dtype=object)
+
+
+def test_id_columns_are_skipped():
+    classifier = PhoneColumnClassifier()
+    assert classifier.select(log_frame([str(i) for i in range(10)])) == ["phone"]
+    assert classifier.summary()["logs"][0]["skipped"] == {"graph_id": 0.0, "ph_id": 0.0}
+
+
+def test_zero_sample_selects_by_header():
+    assert PhoneColumnClassifier(0).select(log_frame([str(i) for i in range(10)])) == ["graph_id", "ph_id", "phone"]
+
+
+def test_skipped_column_is_sampled_again_for_the_next_log():
+    classifier = PhoneColumnClassifier()
+    assert classifier.classify(log_frame([str(i) for i in range(10)]), "a.csv") == ["phone"]
+    assert classifier.classify(log_frame(["5551234567"] * 10), "b.csv") == ["graph_id", "ph_id", "phone"]
+    assert classifier.select(log_frame(["1"]), "a.csv") == ["phone"]
+
+    copy = PhoneColumnClassifier.from_dict(classifier.as_dict())
+    assert copy.select(log_frame(["1"]), "a.csv") == ["phone"]
+    assert copy.select(log_frame(["1"]), "c.csv") == ["graph_id", "ph_id", "phone"]
+
+
+def test_run_scrubs_a_column_skipped_in_an_earlier_log(tmp_path):
+    (tmp_path / "list.csv").write_text(LIST)
+    log_files = []
+    for name, ids in (("A.csv", [str(i) for i in range(10)]), ("B.csv", ["5551234567"] * 10)):
+        log_frame(ids).to_csv(tmp_path / name, index=False)
+        log_files.append(str(tmp_path / name))
+
+    written = run(str(tmp_path / "list.csv"), log_files, [{"type": "SMS", "threshold": 2}], str(tmp_path / "out"),
+                  write_list=False)
+    scrubbed = [path for path in written if os.path.basename(path).startswith("Scrubbed_B")]
+    with open(scrubbed[0]) as f:
+        assert "5551234567" not in f.read()
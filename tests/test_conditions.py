@@ -0,0 +1,40 @@
+import pandas as pd
+
+from scrubber.cli import parse_condition
+from scrubber.conditions import occurrence_table, parse_rule, select_numbers
+
+LIST = pd.DataFrame(
+    [
+        ("A", "SMS", "2024-01-01"), ("A", "SMS", "2024-02-01"), ("A", "SMS", "2024-03-01"),
+        ("B", "SMS", "2024-05-01"), ("B", "Call", "2024-05-01"),
+        ("C", "Call", "2024-01-01"), ("C", "Call", "2024-01-02"),
+    ],
+    columns=["Phone", "Log Type", "Date"],
+)
+
+
+def selected(*conditions):
+    return [set(numbers) for _, numbers in select_numbers(occurrence_table(LIST), list(conditions), LIST)]
+
+
+def test_max_is_an_inclusive_upper_bound():
+    assert selected({"type": "SMS", "threshold": 1, "max": 2}) == [{"B"}]
+    assert selected({"type": "SMS", "threshold": 1, "max": 3}) == [{"A", "B"}]
+
+
+def test_any_and_all_of_several_types():
+    assert selected({"types": ["SMS", "Call"], "threshold": 2}) == [{"A", "C"}]
+    assert selected({"types": ["SMS", "Call"], "threshold": 1, "match": "all"}) == [{"B"}]
+
+
+def test_date_window_counts_only_rows_inside_it():
+    assert selected({"type": "SMS", "threshold": 2, "since": "2024-02-01"}) == [{"A"}]
+    assert selected({"type": "SMS", "threshold": 3, "since": "2024-02-01"}) == []
+    assert selected({"type": "Call", "threshold": 1, "until": "2024-01-01"}) == [{"C"}]
+    assert selected({"type": "SMS", "threshold": 1, "since": "2024-02-01", "until": "2024-03-01"}) == [{"A"}]
+
+
+def test_spellings_of_one_type_count_once():
+    condition = parse_condition("SMS+sms=1")
+    assert parse_rule(condition).types == ("Sms",)
+    assert selected(condition) == [{"A", "B"}]
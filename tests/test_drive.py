@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from fake_drive import FakeDriveServer  # noqa: E402
+from scrubber.drive import DriveUploader, build_drive_service, result_of  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+
+def uploader(server, **options):
+    return DriveUploader(build_drive_service(api_endpoint=server.url), **options)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_transient_errors(status):
+    with FakeDriveServer(fail_first=2, fail_status=status) as server:
+        with uploader(server, retries=2) as drive:
+            file_id = drive.upload("a.csv", b"name,phone\n", "folder")
+    assert server.files[file_id]["content"] == b"name,phone\n"
+    assert server.files[file_id]["parents"] == ["folder"]
+    assert server.requests == 3
+
+
+def test_resumable_upload_continues_after_interrupted_chunk():
+    data = bytes(range(256)) * 4100
+    with FakeDriveServer(drop_chunks=1) as server:
+        with uploader(server, chunk_size=256 * 1024, resumable_threshold=0) as drive:
+            file_id = drive.upload("big.csv", data, "folder")
+    assert server.dropped == 1
+    # The upload asked how much of the cut-off chunk arrived instead of starting over
+    assert server.status_queries == 1
+    assert server.files[file_id]["content"] == data
+
+
+def test_failed_file_does_not_abort_batch():
+    jobs = [("a.csv", b"a", "folder"), ("bad.csv", b"b", "folder"), ("c.csv", b"c", "folder")]
+    with FakeDriveServer(reject={"bad.csv"}) as server:
+        with uploader(server) as drive:
+            results = [result_of(job, future) for job, future in drive.submit_all(jobs)]
+    assert [result.error is None for result in results] == [True, False, True]
+    assert sorted(record["name"] for record in server.files.values()) == ["a.csv", "c.csv"]
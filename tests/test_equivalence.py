@@ -0,0 +1,52 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from benchmarks.synthetic import generate
+from scrubber import shard
+from scrubber.ingest import read_list, read_log
+from scrubber.output import serialize_outputs
+from scrubber.pipeline import process_data, run
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return generate(str(tmp_path_factory.mktemp("data")), list_rows=4000, log_rows=3000, logs=3, seed=1)
+
+
+def read_outputs(directory):
+    outputs = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'rb') as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+def in_memory_outputs(dataset):
+    """Outputs the way the app builds them: whole frames, then serialized"""
+    log_names = [os.path.basename(path) for path in dataset.log_files]
+    results = process_data([read_log(path) for path in dataset.log_files],
+                           read_list(dataset.list_file, columns=None), dataset.conditions, log_names)
+    outputs = {}
+    for output in serialize_outputs(*results, log_names, datetime.now().strftime("%Y%m%d")):
+        with output.open() as f:
+            outputs[output.name] = f.read()
+        output.close()
+    return outputs
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"chunksize": 700},
+    {"workers": 2, "split_rows": 1000},
+])
+def test_run_matches_in_memory_outputs(dataset, tmp_path, options):
+    run(dataset.list_file, dataset.log_files, dataset.conditions, str(tmp_path), **options)
+    assert read_outputs(str(tmp_path)) == in_memory_outputs(dataset)
+
+
+def test_sharded_run_matches_in_memory_outputs(dataset, tmp_path):
+    shard.run_local(dataset.list_file, dataset.log_files, dataset.conditions, str(tmp_path / "out"),
+                    workers=2, shared_dir=str(tmp_path / "shared"), shard_rows=1000)
+    assert read_outputs(str(tmp_path / "out")) == in_memory_outputs(dataset)
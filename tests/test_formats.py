@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scrubber.formats import convert_csv, write_frame
+from scrubber.ingest import read_log
+from scrubber.normalize import phone_keys
+from scrubber.pipeline import scrub_log, scrub_log_file
+from scrubber.suppression import SuppressionIndex
+
+parquet = pytest.importorskip("pyarrow.parquet")
+
+LOG = """name,phone,mobile number,notes
+a,5551234567,,x
+b,,(555) 765-4321,
+c,5551234567.0,5550001111,"quoted, text"
+,5559998888,,
+"""
+
+
+def streamed_parquet(df, tmp_path):
+    """df written the way the CLI, watch folder and shard merge do: CSV first, then streamed"""
+    csv_path = tmp_path / "streamed.csv"
+    df.to_csv(csv_path, index=False)
+    return parquet.read_table(convert_csv(str(csv_path), "parquet"))
+
+
+def frame_parquet(df, tmp_path):
+    """df written the way the app does, straight from the frame"""
+    path = tmp_path / "frame.parquet"
+    write_frame(df, str(path), "parquet")
+    return parquet.read_table(path)
+
+
+def test_parquet_writers_agree_on_scrubbed_log(tmp_path):
+    log_path = tmp_path / "log.csv"
+    log_path.write_text(LOG)
+    suppression = SuppressionIndex(phone_keys(pd.Series(["5551234567"])))
+
+    scrubbed_df, _ = scrub_log(read_log(str(log_path)), suppression, "log.csv")
+    scrubbed_path = tmp_path / "scrubbed.csv"
+    scrub_log_file(str(log_path), suppression, str(scrubbed_path), str(tmp_path / "removed.csv"), None, "log.csv")
+
+    streamed = parquet.read_table(convert_csv(str(scrubbed_path), "parquet"))
+    framed = frame_parquet(scrubbed_df, tmp_path)
+    assert framed.equals(streamed, check_metadata=True)
+    assert sum(column.null_count for column in framed.columns) == 0
+
+
+def test_parquet_writers_agree_on_mixed_dtypes(tmp_path):
+    # The updated list carries an integer occurrence column next to text with gaps
+    df = pd.DataFrame({
+        "Phone": ["5551234567", np.nan, ""],
+        "occurrence": [3, 1, 2],
+        "score": [0.5, np.nan, 2.0],
+    })
+    framed = frame_parquet(df, tmp_path)
+    assert framed.equals(streamed_parquet(df, tmp_path), check_metadata=True)
+    assert framed.column("Phone").to_pylist() == ["5551234567", "", ""]
+    assert framed.column("occurrence").to_pylist() == ["3", "1", "2"]
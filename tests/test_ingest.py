@@ -0,0 +1,35 @@
+import pandas as pd
+
+from scrubber.ingest import read_log, read_log_range, row_boundaries
+
+LOG = (
+    'name,phone,notes\r\n'
+    'a,5551234567,"two\r\nlines"\r\n'
+    'b,5559876543,"say ""hi"""\r\n'
+    'c,,plain\r\n'
+    '\r\n'
+    'd,5550001111,"x,\ny"\r\n'
+    'e,5552223333,\r\n'
+)
+
+
+def test_row_boundaries_skip_quoted_newlines(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_bytes(LOG.encode())
+    data = LOG.encode()
+    offsets = row_boundaries(str(path), 1)
+    # Every boundary follows a newline outside quotes, and the last row's end is left out
+    assert offsets == [data.index(b'b,'), data.index(b'c,'), data.index(b'\r\n\r\n') + 2, data.index(b'd,'),
+                       data.index(b'\r\ne,') + 2]
+
+
+def test_ranges_read_the_same_rows_as_the_whole_file(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_bytes(LOG.encode())
+    whole = read_log(str(path), engine="c")
+    for every in (1, 2, 4):
+        offsets = row_boundaries(str(path), every)
+        for chunksize in (None, 1):
+            frames = [frame for start, end in zip([0] + offsets, offsets + [None])
+                      for frame in read_log_range(str(path), start, end, chunksize)]
+            assert pd.concat(frames, ignore_index=True).equals(whole)
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from scrubber.normalize import NormalizationCache, normalize_phone_column
+
+VALUES = ["5551234567", "5551234567.0", "(555) 123-4567", "", None, np.nan, "1-555-000-1111", "abc",
+          "0012", "1e10", "9" * 30, 5551234567]
+
+
+def test_cache_matches_uncached_normalization():
+    rng = random.Random(0)
+    for max_entries in (0, 1, 5, 250000):
+        cache = NormalizationCache(max_entries)
+        for _ in range(50):
+            values = pd.Series(rng.choices(VALUES + [str(rng.randrange(1000)) for _ in range(5)], k=30),
+                               dtype=object)
+            cached = cache.normalize_keys(values)
+            expected = normalize_phone_column(values)
+            assert cached.repaired.equals(expected.repaired)
+            assert cached.digits.equals(expected.digits)
+            assert np.array_equal(cached.keys, expected.keys)
+            assert len(cache) <= max_entries
+
+
+def test_cache_evicts_least_recently_used():
+    # Batches find one value of seven, too few to keep the cache in use otherwise
+    cache = NormalizationCache(16, min_hit_share=0)
+    for i in range(40):
+        batch = pd.Series(["5551234567"] + [f"{i:05d}{j:05d}" for j in range(6)])
+        # Values are stored the second time they miss
+        cache.normalize(batch)
+        cache.normalize(batch)
+        assert len(cache) <= 16
+
+    hits = cache.hits
+    cache.normalize(pd.Series(["5551234567"]))
+    assert cache.hits == hits + 1
+    cache.normalize(pd.Series(["0000000000"]))
+    assert cache.hits == hits + 1
+
+
+def test_cache_is_bypassed_while_lookups_find_little():
+    cache = NormalizationCache(1000)
+    repeated = pd.Series([str(5550000000 + i) for i in range(100)])
+    cache.normalize(repeated)
+    cache.normalize(repeated)
+    assert cache.hits == 100
+
+    # Columns finding nothing bypass the cache for the next column, then the next two
+    for i in range(4):
+        cache.normalize(pd.Series([str(5560000000 + 100 * i + j) for j in range(100)]))
+    hits = cache.hits
+    cache.normalize(repeated)
+    assert cache.hits == hits
+    cache.normalize(repeated)
+    assert cache.hits == hits + 100
+
+
+def test_zero_entries_never_look_up():
+    cache = NormalizationCache(0)
+    values = pd.Series(VALUES, dtype=object)
+    for _ in range(3):
+        cache.normalize(values)
+    assert (cache.hits, len(cache)) == (0, 0)
+    assert cache.cells == 3 * len(VALUES)
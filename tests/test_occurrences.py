@@ -0,0 +1,59 @@
+import random
+
+from scrubber.ingest import read_list
+from scrubber.occurrences import OccurrenceStore
+from scrubber.pipeline import prepare_list
+
+CONDITIONS = [{"type": "SMS", "threshold": 2}, {"types": ["Call", "SMS"], "threshold": 2, "max": 3, "match": "all"}]
+
+
+def list_rows(count, seed):
+    rng = random.Random(seed)
+    formats = ["{}", "1{}", "({}) {}-{}", "{}.0"]
+    rows = []
+    for _ in range(count):
+        number = f"555{rng.randrange(150):07d}"
+        text = rng.choice(formats)
+        if text.startswith("("):
+            text = text.format(number[:3], number[3:6], number[6:])
+        else:
+            text = text.format(number)
+        rows.append(f'{rng.choice(["SMS", "sms", "Call"])},"{text}"\n')
+    return "".join(rows)
+
+
+def prepared(path):
+    return prepare_list(read_list(path), CONDITIONS)[1]
+
+
+def store_suppression(store_path, list_path):
+    with OccurrenceStore(store_path) as store:
+        rows = store.ingest(list_path)
+        return rows, store.rows, store.suppression(CONDITIONS)
+
+
+def test_appended_rows_resume_from_the_saved_offset(tmp_path):
+    list_path = tmp_path / "list.csv"
+    list_path.write_text("Log Type,Phone\n" + list_rows(300, 1))
+    store_path = str(tmp_path / "store.sqlite")
+    assert store_suppression(store_path, str(list_path))[:2] == (300, 300)
+
+    with open(list_path, "a") as f:
+        f.write(list_rows(50, 2))
+    rows, total, suppression = store_suppression(store_path, str(list_path))
+    assert (rows, total) == (50, 350)
+    assert suppression.fingerprint() == prepared(str(list_path)).fingerprint()
+    assert store_suppression(store_path, str(list_path))[:2] == (0, 350)
+
+
+def test_rewritten_list_is_counted_again(tmp_path):
+    list_path = tmp_path / "list.csv"
+    list_path.write_text("Log Type,Phone\n" + list_rows(300, 1))
+    store_path = str(tmp_path / "store.sqlite")
+    store_suppression(store_path, str(list_path))
+
+    # Different rows before the saved offset, then more rows
+    list_path.write_text("Log Type,Phone\n" + list_rows(300, 3) + list_rows(20, 4))
+    rows, total, suppression = store_suppression(store_path, str(list_path))
+    assert (rows, total) == (320, 320)
+    assert suppression.fingerprint() == prepared(str(list_path)).fingerprint()
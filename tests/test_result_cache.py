@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+
+from scrubber.pipeline import run
+from scrubber.result_cache import ResultCache
+
+LIST = """Log Type,Phone
+SMS,5551234567
+SMS,5551234567
+"""
+
+CONDITIONS = [{"type": "SMS", "threshold": 2}]
+
+
+def write_log(path, ph_ids):
+    pd.DataFrame({"ph_id": ph_ids, "phone": [f"555000{i:04d}" for i in range(len(ph_ids))]}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_key_holds_the_columns_picked_for_the_log(tmp_path):
+    (tmp_path / "list.csv").write_text(LIST)
+    # One suppressed number among ids: sampled alone, ph_id is skipped
+    mostly_ids = write_log(tmp_path / "ids.csv", ["5551234567"] + [str(i) for i in range(1, 10)])
+    # A log of the same layout with numbers in ph_id makes ph_id a phone column for later logs
+    numbers = write_log(tmp_path / "numbers.csv", [f"555111{i:04d}" for i in range(10)])
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    def scrubbed_ids(log_files, output_dir):
+        written = run(str(tmp_path / "list.csv"), log_files, CONDITIONS, str(tmp_path / output_dir),
+                      write_list=False, result_cache=cache)
+        with open(next(path for path in written if "Scrubbed_ids" in path)) as f:
+            return f.read()
+
+    assert "5551234567" in scrubbed_ids([mostly_ids], "alone")
+    assert "5551234567" not in scrubbed_ids([numbers, mostly_ids], "after")
+    assert cache.hits == 0
+
+
+def test_rerun_hits_and_a_changed_list_misses(tmp_path):
+    (tmp_path / "list.csv").write_text(LIST)
+    log = write_log(tmp_path / "log.csv", [str(i) for i in range(10)] + ["5551234567"] * 2)
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    def outputs(output_dir):
+        written = run(str(tmp_path / "list.csv"), [log], CONDITIONS, str(tmp_path / output_dir), write_list=False,
+                      result_cache=cache)
+        contents = []
+        for path in written:
+            with open(path) as f:
+                contents.append(f.read())
+        return contents
+
+    first = outputs("first")
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert outputs("second") == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    (tmp_path / "list.csv").write_text(LIST + "SMS,5550000003\nSMS,5550000003\n")
+    assert outputs("third") != first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Room for two entries of 1000 bytes and their metadata
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=2500)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(key, b"x" * 1000, None, 1, 0)
+        # Entries store their last use in their metadata file's mtime
+        os.utime(os.path.join(cache.directory, key, "meta.json"), (1000 + i, 1000 + i))
+    assert sorted(os.listdir(cache.directory)) == ["b", "c"]
+
+    # Using b makes it newer than c, so c goes next
+    assert cache.get("b") is not None
+    cache.put("d", b"x" * 1000, None, 1, 0)
+    assert sorted(os.listdir(cache.directory)) == ["b", "d"]
+    assert cache.get("c") is None
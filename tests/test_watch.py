@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+pytest.importorskip("watchdog")
+
+from scrubber import watch  # noqa: E402
+from scrubber.watch import WatchDaemon, unique_names  # noqa: E402
+
+LIST = """Log Type,Phone
+SMS,5551234567
+SMS,5551234567
+"""
+
+LOG = """name,phone
+a,5551234567
+b,5559876543
+"""
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    (tmp_path / "list.csv").write_text(LIST)
+    return WatchDaemon(str(inbox), str(tmp_path / "list.csv"), [{"type": "SMS", "threshold": 2}],
+                       str(tmp_path / "outbox"), settle=0)
+
+
+def test_same_log_name_keeps_earlier_outputs(daemon):
+    written = []
+    for content in (LOG, LOG + "c,5551234567\n"):
+        path = os.path.join(daemon.inbox, "log.csv")
+        with open(path, "w") as f:
+            f.write(content)
+        written.append(daemon.process(path))
+
+    first, second = written
+    assert len(set(first + second)) == 4
+    assert all(os.path.exists(path) for path in first + second)
+    with open(first[0]) as f:
+        assert "c," not in f.read()
+    with open(second[0]) as f:
+        assert "c," in f.read()
+    assert len(os.listdir(os.path.join(daemon.inbox, watch.PROCESSED_DIR))) == 2
+
+
+def test_unique_names_keep_compound_extensions(tmp_path):
+    (tmp_path / "Scrubbed_a.csv_20240101.csv.zst").write_text("")
+    scrubbed, removed = unique_names(str(tmp_path), ["Scrubbed_a.csv_20240101.csv.zst",
+                                                     "Removed_Records_a.csv_20240101.csv.zst"])
+    assert scrubbed.startswith("Scrubbed_a.csv_20240101_") and scrubbed.endswith(".csv.zst")
+    assert removed.endswith(scrubbed[len("Scrubbed_a.csv_20240101"):])
+
+
+def test_scan_skips_logs_removed_while_listing(daemon, monkeypatch):
+    for name in ("gone.csv", "kept.csv"):
+        with open(os.path.join(daemon.inbox, name), "w") as f:
+            f.write(LOG)
+    getmtime = os.path.getmtime
+
+    def vanishing(path):
+        if path.endswith("gone.csv"):
+            raise FileNotFoundError(path)
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", vanishing)
+    daemon.scan()
+    assert daemon._queue.get_nowait() == os.path.join(daemon.inbox, "kept.csv")
+    assert daemon._queue.empty()
@@ -1,6 +1,14 @@
+import time
+
+# Time-to-first-window is measured from here
+STARTED = time.perf_counter()
+
 import sys
 import os
-import pandas as pd
+import multiprocessing
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import wait
 from datetime import datetime
 import json
 from dotenv import load_dotenv
@@ -8,15 +16,310 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, 
     QPushButton, QLabel, QFileDialog, QListWidget, QSpinBox, 
     QHBoxLayout, QLineEdit, QMessageBox, QProgressBar, QTextEdit,
-    QScrollArea
+    QScrollArea, QCheckBox, QComboBox
 )
-from PyQt6.QtCore import Qt, QTimer
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from io import BytesIO
-import zipfile
-import re
+from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
+from scrubber.formats import available_formats
+from scrubber.instrument import process_age
+# pandas, the pipeline and the Google client libraries are imported on
+# first use, so the window shows before they load
+
+Batch = namedtuple("Batch", "number list_file log_files log_names conditions save_path use_cache output_format")
+
+OUTPUT_FORMAT_LABELS = {"csv": "CSV", "csv.zst": "CSV (zstd compressed)", "parquet": "Parquet"}
+PendingUploads = namedtuple("PendingUploads", "batch outputs submitted reported report started")
+
+
+def run_report_path(save_path):
+    """Where the JSON run report of a batch saved to save_path goes"""
+    return f"{os.path.splitext(save_path)[0]}_run_report.json"
+
+
+class BatchWorker(QThread):
+    """Run queued batches off the GUI thread: scrub, save the ZIP, then upload
+
+    Uploads of one batch keep going on the uploader's pool while the next
+    batch is scrubbed. cancel() stops the running batch at the next file,
+    column or chunk boundary, drops queued batches and cancels uploads that
+    haven't started.
+    """
+    status = pyqtSignal(str, object)
+    batch_finished = pyqtSignal(int, list)
+    batch_failed = pyqtSignal(int, str)
+    batch_cancelled = pyqtSignal(int)
+
+    def __init__(self, folders, parent=None):
+        super().__init__(parent)
+        self.folders = folders
+        self.uploader = None
+        # Set once Drive has connected or failed to, see LogProcessorApp.initialize_drive_service
+        self.drive_ready = threading.Event()
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._running = False
+        self._batches = 0
+        self._cancelled_through = 0
+
+    def enqueue(self, list_file, log_files, log_names, conditions, save_path, use_cache=True,
+                output_format="csv"):
+        """Queue a batch and start the thread if idle, returning the batch number"""
+        with self._lock:
+            self._batches += 1
+            self._queue.append(Batch(self._batches, list_file, list(log_files), list(log_names),
+                                     list(conditions), save_path, use_cache, output_format))
+            start = not self._running
+            self._running = True
+        if start:
+            # The previous run() may still be returning
+            self.wait()
+            self.start()
+        return self._batches
+
+    def cancel(self):
+        """Cancel the running batch and every queued batch"""
+        with self._lock:
+            self._cancelled_through = self._batches
+            self._queue.clear()
+
+    def run(self):
+        from scrubber.pipeline import Cancelled
+
+        pending_uploads = []
+        while True:
+            with self._lock:
+                batch = self._queue.popleft() if self._queue else None
+                if batch is None and not pending_uploads:
+                    self._running = False
+                    return
+
+            if batch is None:
+                self._collect_uploads(pending_uploads, timeout=0.2)
+                continue
+
+            try:
+                pending_uploads.append(self._run_batch(batch))
+            except Cancelled:
+                self.status.emit(f"Batch {batch.number} cancelled", 0)
+                self.batch_cancelled.emit(batch.number)
+            except Exception as e:
+                self.status.emit(f"Error during processing: {str(e)}", None)
+                self.batch_failed.emit(batch.number, str(e))
+            self._collect_uploads(pending_uploads, timeout=0)
+
+    def _progress(self, batch):
+        """Progress callback for a batch that doubles as its cancellation point"""
+        from scrubber.pipeline import Cancelled
+
+        def progress(message, percent=None):
+            if batch.number <= self._cancelled_through:
+                raise Cancelled()
+            self.status.emit(message, percent)
+        return progress
+
+    def _run_batch(self, batch):
+        """Scrub a batch, write its ZIP and queue its uploads"""
+        from scrubber.columns import PhoneColumnClassifier
+        from scrubber.drive import UploadJob
+        from scrubber.formats import output_name
+        from scrubber.ingest import read_list, read_log
+        from scrubber.instrument import RunReport, scaled_progress
+        from scrubber.normalize import NormalizationCache
+        from scrubber.output import OutputFile, write_zip
+        from scrubber.pipeline import (
+            classify_log, clean_df, prepare_list, removed_records_name, report_normalization, scrub_logs,
+            scrubbed_log_name, updated_list_name
+        )
+        from scrubber.result_cache import ResultCache, default_cache_dir
+
+        progress = self._progress(batch)
+        progress(f"Starting batch {batch.number}...", 0)
+        # Stage summaries go to the status panel; they aren't cancellation points
+        report = RunReport(lambda message, percent=None: self.status.emit(message, None))
+
+        with report.stage("load list") as stage:
+            # The updated list is uploaded too, so keep every column
+            list_df = read_list(batch.list_file, columns=None)
+            stage["rows"] = len(list_df)
+        # Numbers recur across the list and the logs, so they are normalized once per batch
+        normalization_cache = NormalizationCache()
+        list_df, suppression = prepare_list(list_df, batch.conditions, scaled_progress(progress, 5, 20), report,
+                                            normalization_cache)
+        current_date = datetime.now().strftime("%Y%m%d")
+        # Phone-like columns such as ids are skipped unless their values look like phone numbers
+        column_classifier = PhoneColumnClassifier()
+
+        # Logs scrubbed before against the same suppression set come from the cache
+        cache = None
+        keys = {}
+        cached_outputs = {}
+        if batch.use_cache:
+            cache = ResultCache(default_cache_dir())
+            with report.stage("result cache", files=len(batch.log_files)) as stage:
+                for i, (file, log_name) in enumerate(zip(batch.log_files, batch.log_names)):
+                    # The columns picked for this log are part of its key
+                    head = read_log(file, nrows=column_classifier.sample_window)
+                    phone_columns = classify_log(column_classifier, head, log_name)
+                    keys[i] = cache.key(file, suppression, batch.output_format, column_classifier, phone_columns)
+                    hit = cache.get(keys[i])
+                    if hit is None:
+                        continue
+                    try:
+                        scrubbed_name = output_name(scrubbed_log_name(log_name, current_date), batch.output_format)
+                        outputs = [OutputFile.from_file(scrubbed_name, "scrubbed", hit.scrubbed_path)]
+                        if hit.removed_path:
+                            removed_name = output_name(removed_records_name(log_name, current_date),
+                                                       batch.output_format)
+                            outputs.append(OutputFile.from_file(removed_name, "removed", hit.removed_path))
+                    except OSError:
+                        # Evicted by another run in the meantime
+                        continue
+                    cached_outputs[i] = outputs
+                    report.file_done(log_name, hit.rows, hit.removed, cached=True)
+                stage["hits"] = len(cached_outputs)
+            if cached_outputs:
+                progress(f"Reused cached results for {len(cached_outputs)} of {len(batch.log_files)} log files", 20)
+        pending = [i for i in range(len(batch.log_files)) if i not in cached_outputs]
+
+        # Reading the rest takes 20-30% of the bar, by bytes read
+        sizes = [os.path.getsize(batch.log_files[i]) for i in pending]
+        with report.stage("load", files=len(pending)) as stage:
+            log_dfs = []
+            for n, i in enumerate(pending):
+                progress(f"Reading {batch.log_names[i]}", 20 + sum(sizes[:n]) / max(sum(sizes), 1) * 10)
+                log_dfs.append(read_log(batch.log_files[i]))
+            stage["rows"] = sum(len(log_df) for log_df in log_dfs)
+        updated_log_dfs, removed_log_records = scrub_logs(
+            log_dfs,
+            [batch.log_names[i] for i in pending],
+            suppression,
+            progress=scaled_progress(progress, 30, 85),
+            workers=min(len(pending), os.cpu_count() or 1),
+            report=report,
+            normalization_cache=normalization_cache,
+            column_classifier=column_classifier
+        )
+        report_normalization(normalization_cache, lambda message: self.status.emit(message, None), report)
+        report.counters["phone_columns"] = column_classifier.summary()
+        del log_dfs
+        self._audit(batch, report, suppression, column_classifier, cached_outputs,
+                    dict(zip(pending, removed_log_records)))
+        progress("Data processing completed!", 85)
+
+        # Serialize every output once for both Google Drive and the ZIP
+        progress("Serializing processed files...", 85)
+        output_rows = len(list_df) + sum(len(df) for df in updated_log_dfs + removed_log_records)
+        with report.stage("serialize", rows=output_rows):
+            outputs = [OutputFile.from_frame(updated_list_name(current_date), "list", clean_df(list_df),
+                                             output_format=batch.output_format)]
+            del list_df
+            fresh = iter(zip(pending, updated_log_dfs, removed_log_records))
+            for i, log_name in enumerate(batch.log_names):
+                if i in cached_outputs:
+                    outputs.extend(cached_outputs[i])
+                    continue
+                _, log_df, rem_df = next(fresh)
+                scrubbed = OutputFile.from_frame(scrubbed_log_name(log_name, current_date), "scrubbed", log_df,
+                                                 output_format=batch.output_format)
+                removed = None
+                if not rem_df.empty:
+                    removed = OutputFile.from_frame(removed_records_name(log_name, current_date), "removed", rem_df,
+                                                    output_format=batch.output_format)
+                outputs.extend(output for output in (scrubbed, removed) if output is not None)
+                if cache is not None:
+                    cache.put(keys[i], scrubbed.source(), removed.source() if removed else None,
+                              len(log_df), len(rem_df))
+        try:
+            if batch.save_path:
+                progress("Creating download package...", 90)
+                with report.stage("zip", bytes=sum(output.size for output in outputs)):
+                    write_zip(outputs, batch.save_path)
+                progress(f"Saved processed files to {batch.save_path}", 95)
+
+            progress("Uploading processed files to Google Drive...")
+        except BaseException:
+            for output in outputs:
+                output.close()
+            raise
+
+        # A batch queued right after startup may finish before Drive has connected
+        self.drive_ready.wait()
+        if self.uploader is None:
+            self.status.emit("Google Drive is not connected, skipping uploads", None)
+            return PendingUploads(batch, outputs, [], [], report, time.perf_counter())
+
+        started = time.perf_counter()
+        submitted = self.uploader.submit_all(
+            UploadJob(output.name, output.source(), self.folders[output.kind]) for output in outputs
+        )
+        reported = []
+        for job, future in submitted:
+            future.add_done_callback(lambda future, job=job: self._report_upload(job, future, reported))
+        return PendingUploads(batch, outputs, submitted, reported, report, started)
+
+    def _audit(self, batch, report, suppression, column_classifier, cached_outputs, removed_frames):
+        """Add the batch's removed numbers, cached logs included, to the audit index"""
+        import sqlite3
+
+        from scrubber.audit import AuditLog, default_audit_path
+        from scrubber.formats import read_frame
+
+        for i, outputs in cached_outputs.items():
+            for output in outputs:
+                if output.kind == "removed":
+                    with output.open() as f:
+                        removed_frames[i] = read_frame(f, batch.output_format)
+        try:
+            with report.stage("audit", files=len(removed_frames)) as stage, \
+                    AuditLog(default_audit_path()) as audit_log:
+                run_id = audit_log.start_run(batch.list_file, batch.conditions)
+                stage["numbers"] = sum(
+                    audit_log.record(run_id, batch.log_names[i], rem_df,
+                                     column_classifier.select(rem_df, batch.log_names[i]), suppression)
+                    for i, rem_df in sorted(removed_frames.items()) if not rem_df.empty
+                )
+        except sqlite3.Error as e:
+            # The scrub itself is done; a locked or damaged index shouldn't fail the batch
+            self.status.emit(f"Audit index not updated: {e}", None)
+
+    def _report_upload(self, job, future, reported):
+        """Emit an upload's status as soon as it finishes, from the uploader's thread"""
+        from scrubber.drive import describe_result, result_of
+
+        self.status.emit(describe_result(result_of(job, future)), None)
+        reported.append(job.name)
+
+    def _collect_uploads(self, pending_uploads, timeout):
+        """Report batches whose uploads have all finished and free their outputs"""
+        for entry in list(pending_uploads):
+            batch, outputs, submitted, reported, report, started = entry
+            if batch.number <= self._cancelled_through:
+                for _, future in submitted:
+                    future.cancel()
+            _, not_done = wait([future for _, future in submitted], timeout=timeout)
+            if not_done or len(reported) < len(submitted):
+                continue
+
+            pending_uploads.remove(entry)
+            if submitted:
+                report.record({"name": "upload", "files": len(submitted),
+                               "bytes": sum(output.size for output in outputs)},
+                              time.perf_counter() - started)
+            for output in outputs:
+                output.close()
+            if self.uploader is None:
+                failed_uploads = [output.name for output in outputs]
+            else:
+                from scrubber.drive import result_of
+
+                failed_uploads = [job.name for job, future in submitted
+                                  if result_of(job, future).error is not None]
+            if batch.save_path:
+                try:
+                    report.save(run_report_path(batch.save_path))
+                except OSError as e:
+                    self.status.emit(f"Could not save the run report: {str(e)}", None)
+            self.batch_finished.emit(batch.number, failed_uploads)
+
 
 class LogProcessorApp(QMainWindow):
     def __init__(self):
@@ -154,6 +457,19 @@ class LogProcessorApp(QMainWindow):
         
         main_layout.addWidget(progress_group)
 
+        # Output options
+        options_row = QWidget()
+        options_layout = QHBoxLayout(options_row)
+        options_layout.addWidget(QLabel("Output format:"))
+        self.output_format = QComboBox()
+        for output_format in available_formats():
+            self.output_format.addItem(OUTPUT_FORMAT_LABELS[output_format], output_format)
+        options_layout.addWidget(self.output_format)
+        options_layout.addStretch()
+        self.bypass_cache = QCheckBox("Bypass result cache (scrub every log file again)")
+        options_layout.addWidget(self.bypass_cache)
+        main_layout.addWidget(options_row)
+
         # Process Button
         self.process_button = QPushButton("Process Files")
         self.process_button.setEnabled(False)
@@ -173,6 +489,12 @@ class LogProcessorApp(QMainWindow):
         """)
         main_layout.addWidget(self.process_button)
 
+        # Cancel Button
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        main_layout.addWidget(self.cancel_button)
+
         # Initialize variables
         self.list_file = None
         self.log_files = []
@@ -182,9 +504,22 @@ class LogProcessorApp(QMainWindow):
         self.REMOVED_FOLDER_ID = "18evx04gWua9ls1mDiIr5FvAQhdFbrwfr"
         self.SCRUBBED_FOLDER_ID = "1-jYrCY5ev44Hy5fXVwOZSjw7xPSTy9ML"
         self.service = None
+        self.uploader = None
+
+        # Background worker that runs queued batches
+        self.worker = BatchWorker({
+            "list": self.REMOVED_FOLDER_ID,
+            "scrubbed": self.SCRUBBED_FOLDER_ID,
+            "removed": self.REMOVED_FOLDER_ID,
+        }, self)
+        self.worker.status.connect(self.update_status)
+        self.worker.batch_finished.connect(self.on_batch_finished)
+        self.worker.batch_failed.connect(self.on_batch_failed)
+        self.worker.batch_cancelled.connect(self.on_batch_cancelled)
+        self.worker.finished.connect(lambda: self.cancel_button.setEnabled(False))
         
-        # Initialize Google Drive service
-        QTimer.singleShot(0, self.initialize_drive_service)
+        # Connect to Google Drive off the GUI thread once the window is up
+        QTimer.singleShot(0, lambda: threading.Thread(target=self.initialize_drive_service, daemon=True).start())
 
         # Apply global styling
         self.setStyleSheet("""
@@ -258,263 +593,95 @@ class LogProcessorApp(QMainWindow):
             bool(self.conditions)
         )
 
-    def process_files(self):
-        """Process the files"""
-        try:
-            self.process_button.setEnabled(False)
-            self.progress_bar.setValue(0)
-            self.update_status("Starting file processing...")
-
-            # Process files
-            self.update_status("Processing files...", 10)
-            updated_list_df, updated_log_dfs, removed_log_records = self.process_data(
-                self.log_files, 
-                self.list_file,
-                self.conditions, 
-                [self.log_files_list.item(i).text() for i in range(self.log_files_list.count())]
-            )
-
-            # Upload to Google Drive
-            current_date = datetime.now().strftime("%Y%m%d")
-            
-            # Upload updated list file
-            self.update_status("Uploading processed files to Google Drive...", 70)
-            list_io = BytesIO()
-            updated_list_df.to_csv(list_io, index=False)
-            list_io.seek(0)
-            self.upload_to_drive(
-                f"Updated_List_{current_date}.csv",
-                list_io,
-                self.REMOVED_FOLDER_ID
-            )
+    def update_status(self, message, progress=None):
+        """Append a message to the status log and optionally move the progress bar"""
+        self.status_text.append(message)
+        if progress is not None:
+            self.progress_bar.setValue(int(progress))
 
-            # Upload log files and removed records
-            for i, (log_df, rem_df) in enumerate(zip(updated_log_dfs, removed_log_records), 1):
-                log_name = self.log_files_list.item(i-1).text()
-                progress = 70 + (i / len(updated_log_dfs) * 20)
-                self.progress_bar.setValue(progress)
-                
-                # Upload scrubbed log
-                log_io = BytesIO()
-                log_df.to_csv(log_io, index=False)
-                log_io.seek(0)
-                self.upload_to_drive(
-                    f"Scrubbed_{log_name}_{current_date}.csv",
-                    log_io,
-                    self.SCRUBBED_FOLDER_ID
-                )
-
-                # Upload removed records if they exist
-                if not rem_df.empty:
-                    rem_io = BytesIO()
-                    rem_df.to_csv(rem_io, index=False)
-                    rem_io.seek(0)
-                    self.upload_to_drive(
-                        f"Removed_Records_{log_name}_{current_date}.csv",
-                        rem_io,
-                        self.REMOVED_FOLDER_ID
-                    )
-
-            self.update_status("Creating download package...", 90)
-            
-            # Create local zip file
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                # Add updated list file
-                list_csv = BytesIO()
-                updated_list_df.to_csv(list_csv, index=False)
-                list_csv.seek(0)
-                zip_file.writestr(f"Updated_List_{current_date}.csv", list_csv.getvalue())
-
-                # Add log files and their removed records
-                for i, (log_df, rem_df) in enumerate(zip(updated_log_dfs, removed_log_records)):
-                    log_name = self.log_files_list.item(i).text()
-                    
-                    # Add scrubbed log
-                    log_csv = BytesIO()
-                    log_df.to_csv(log_csv, index=False)
-                    log_csv.seek(0)
-                    zip_file.writestr(f"Scrubbed_{log_name}_{current_date}.csv", log_csv.getvalue())
-
-                    # Add removed records if they exist
-                    if not rem_df.empty:
-                        rem_csv = BytesIO()
-                        rem_df.to_csv(rem_csv, index=False)
-                        rem_csv.seek(0)
-                        zip_file.writestr(f"Removed_Records_{log_name}_{current_date}.csv", 
-                                        rem_csv.getvalue())
-
-            # Save zip file
-            zip_buffer.seek(0)
-            save_path, _ = QFileDialog.getSaveFileName(
-                self, "Save Processed Files", f"processed_files_{current_date}.zip", 
-                "ZIP Files (*.zip)")
-            if save_path:
-                with open(save_path, 'wb') as f:
-                    f.write(zip_buffer.getvalue())
-                self.update_status(f"Saved processed files to {save_path}")
-
-            self.progress_bar.setValue(100)
-            self.update_status("Processing completed successfully!")
+    def process_files(self):
+        """Queue the selected files as a batch for the background worker"""
+        current_date = datetime.now().strftime("%Y%m%d")
+        save_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Processed Files", f"processed_files_{current_date}.zip", 
+            "ZIP Files (*.zip)")
+
+        log_names = [self.log_files_list.item(i).text() for i in range(self.log_files_list.count())]
+        number = self.worker.enqueue(self.list_file, self.log_files, log_names, self.conditions, save_path,
+                                     use_cache=not self.bypass_cache.isChecked(),
+                                     output_format=self.output_format.currentData())
+        self.update_status(f"Queued batch {number} with {len(log_names)} log files")
+        self.cancel_button.setEnabled(True)
+
+        # Clear the log files so the next batch can be picked while this one runs
+        self.log_files = []
+        self.log_files_list.clear()
+        self.update_process_button()
+
+    def cancel_processing(self):
+        """Stop the running batch and drop queued ones"""
+        self.update_status("Cancelling...")
+        self.worker.cancel()
+
+    def on_batch_finished(self, number, failed_uploads):
+        self.progress_bar.setValue(100)
+        if failed_uploads:
+            self.update_status(f"Batch {number} completed with upload failures")
+            QMessageBox.warning(self, "Upload Failed",
+                f"Batch {number} was processed, but these uploads to Google Drive failed:\n" +
+                "\n".join(failed_uploads))
+        else:
+            self.update_status(f"Batch {number} completed successfully!")
             QMessageBox.information(self, "Success", 
-                "Files processed and saved successfully!\nUploaded to Google Drive and saved locally.")
+                f"Batch {number} processed successfully!\nUploaded to Google Drive and saved locally.")
 
-        except Exception as e:
-            self.update_status(f"Error during processing: {str(e)}")
-            QMessageBox.critical(self, "Error", f"Processing failed: {str(e)}")
-        finally:
-            self.process_button.setEnabled(True)
-    def process_data(self, log_dfs, list_df, conditions, log_filenames):
-        """Process the data using conditions"""
-        try:
-            self.update_status("Starting data processing...")
-            self.progress_bar.setValue(10)
-
-            # Define function to clean dataframes
-            def clean_df(df):
-                """Replace all NaN values with empty strings"""
-                return df.fillna('').replace(['nan', 'NaN', 'NaT'], '')
-
-            # Clean input dataframes
-            list_df = clean_df(list_df)
-            log_dfs = [clean_df(df) for df in log_dfs]
-
-            # Normalize list file phone numbers
-            list_df["Phone"] = list_df["Phone"].astype(str).apply(self.clean_number)
-            self.update_status("Normalized phone numbers in list file")
-            self.progress_bar.setValue(20)
-
-            # Compute occurrences
-            list_occurrences = (
-                list_df.groupby(["Log Type", "Phone"])
-                .size()
-                .reset_index(name="occurrence")
-            )
-            list_df = pd.merge(list_df, list_occurrences, on=["Log Type", "Phone"], how="left")
-            self.update_status("Computed phone number occurrences")
-            self.progress_bar.setValue(30)
-
-            # Initialize containers
-            updated_log_dfs = []
-            removed_log_records = []
-
-            # Parse conditions and identify numbers to remove
-            self.update_status("Applying conditions...")
-            parsed_conditions = {cond["type"].title(): cond["threshold"] for cond in conditions}
-            cleaned_phones_to_remove = []
-
-            for cond_type, threshold in parsed_conditions.items():
-                matching_numbers = list_df.loc[
-                    (list_df["Log Type"].str.title() == cond_type) &
-                    (list_df["occurrence"] >= threshold), 
-                    "Phone"
-                ].unique()
-
-                if len(matching_numbers) > 0:
-                    cleaned_phones_to_remove.extend([self.clean_number(phone) for phone in matching_numbers])
-                    self.update_status(f"Found {len(matching_numbers)} numbers matching condition: {cond_type}")
-
-            # Remove duplicates from numbers to remove
-            cleaned_phones_to_remove = list(set(cleaned_phones_to_remove))
-            self.progress_bar.setValue(50)
-
-            # Process each log file
-            total_logs = len(log_dfs)
-            for i, (log_df, filename) in enumerate(zip(log_dfs, log_filenames), 1):
-                self.update_status(f"Processing log file {i}/{total_logs}: {filename}")
-                
-                processed_log_df = log_df.copy()
-                removed_records_df = pd.DataFrame()
-
-                # Normalize column names
-                processed_log_df.columns = processed_log_df.columns.str.strip().str.lower()
-                processed_log_df = clean_df(processed_log_df)
-
-                # Find phone columns
-                phone_columns = [
-                    col for col in processed_log_df.columns
-                    if any(phrase in col.lower() for phrase in ['mobile', 'phone', 'number', 'tel', 'contact', 'ph'])
-                ]
-
-                if not phone_columns:
-                    self.update_status(f"No phone columns found in {filename}")
-                    updated_log_dfs.append(processed_log_df)
-                    removed_log_records.append(pd.DataFrame())
-                    continue
-
-                # Process phone columns
-                rows_with_removed_numbers = set()
-                for col in phone_columns:
-                    self.update_status(f"Processing column: {col}")
-                    processed_log_df[col] = processed_log_df[col].astype(str).apply(
-                        lambda x: f"{int(float(x))}" if x.replace(".", "").isdigit() else x
-                    )
-                    original_values = processed_log_df[col].copy()
-                    cleaned_column = processed_log_df[col].apply(self.clean_number)
-
-                    # Remove matching numbers
-                    remove_mask = cleaned_column.isin(cleaned_phones_to_remove)
-                    if remove_mask.any():
-                        # Store rows that had numbers removed
-                        for idx in processed_log_df[remove_mask].index:
-                            if idx not in rows_with_removed_numbers:
-                                removed_row = processed_log_df.loc[idx].copy()
-                                # Only keep the removed number in the current column
-                                for phone_col in phone_columns:
-                                    removed_row[phone_col] = original_values[idx] if phone_col == col else ''
-                                rows_with_removed_numbers.add(idx)
-                                removed_records_df = pd.concat([removed_records_df, 
-                                                          pd.DataFrame([removed_row])], 
-                                                          ignore_index=True)
-                        
-                        processed_log_df.loc[remove_mask, col] = ''
-                        self.update_status(f"Removed {remove_mask.sum()} numbers from {col}")
-
-                # Clean final dataframes
-                processed_log_df = clean_df(processed_log_df)
-                removed_records_df = clean_df(removed_records_df)
-
-                # Add processed dataframes to lists
-                updated_log_dfs.append(processed_log_df)
-                removed_log_records.append(removed_records_df)
-
-                progress = 50 + (i / total_logs * 40)
-                self.progress_bar.setValue(progress)
-
-            self.update_status("Data processing completed!")
-            return clean_df(list_df), updated_log_dfs, removed_log_records
-
-        except Exception as e:
-            self.update_status(f"Error processing data: {str(e)}")
-            raise e
+    def on_batch_failed(self, number, error):
+        QMessageBox.critical(self, "Error", f"Processing batch {number} failed: {error}")
 
-    def clean_df(self, df):
-        """Replace all NaN values with empty strings"""
-        return df.fillna('').replace(['nan', 'NaN', 'NaT'], '')
+    def on_batch_cancelled(self, number):
+        self.progress_bar.setValue(0)
 
-    def clean_number(self, phone):
-        """Clean and standardize phone numbers"""
-        phone = str(phone)
-        phone = re.sub(r'\D', '', phone)
-        if phone.startswith('1') and len(phone) > 10:
-            phone = phone[1:]
-        return phone
+    def closeEvent(self, event):
+        self.worker.cancel()
+        self.worker.wait()
+        super().closeEvent(event)
 
     def initialize_drive_service(self):
-        """Initialize Google Drive service"""
+        """Initialize Google Drive service; runs on a background thread"""
         try:
+            from google.oauth2.service_account import Credentials
+
+            from scrubber.drive import DriveUploader, build_drive_service
+
             credentials = Credentials.from_service_account_file(
                 'credentials.json',
                 scopes=['https://www.googleapis.com/auth/drive.file']
             )
-            self.service = build('drive', 'v3', credentials=credentials)
+            self.service = build_drive_service(credentials)
+            self.uploader = DriveUploader(self.service, credentials)
+            self.worker.uploader = self.uploader
         except Exception as e:
-            self.status_text.append(f"Failed to initialize Drive service: {str(e)}")
+            # Widgets belong to the GUI thread, so report through the worker's signal
+            self.worker.status.emit(f"Failed to initialize Drive service: {str(e)}", None)
+        finally:
+            self.worker.drive_ready.set()
+
+    def report_startup(self, exit_after=False):
+        """Log how long the window took to show; with exit_after, print it as JSON and quit"""
+        startup = {"window_seconds": round(time.perf_counter() - STARTED, 4), "process_seconds": process_age()}
+        self.update_status(f"Window shown {startup['window_seconds']:.2f}s after start")
+        if exit_after:
+            print(json.dumps(startup), flush=True)
+            QApplication.instance().quit()
 
 def main():
+    # Worker processes of the bundled executable must not start the GUI
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = LogProcessorApp()
     window.show()
+    # Runs on the first event loop turn after the window is shown
+    QTimer.singleShot(0, lambda: window.report_startup(exit_after="--measure-startup" in sys.argv))
     sys.exit(app.exec())
 
 if __name__ == "__main__":